@@ -0,0 +1,42 @@
+"""add expense indexes
+
+Revision ID: 14b8581020e6
+Revises: 5b469cf18056
+Create Date: 2026-10-18 05:31:30.322572
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "14b8581020e6"
+down_revision = "5b469cf18056"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_expense_date_parent", "expense", ["date", "parent"], unique=False)
+    op.create_index(
+        "ix_expense_parent",
+        "expense",
+        ["parent"],
+        unique=False,
+        sqlite_where=sa.text("parent IS NOT NULL"),
+    )
+    op.create_index("ix_expense_counterparty_name", "expense", ["counterparty_name"], unique=False)
+    op.create_index(
+        "ix_expense_counterparty_name_p",
+        "expense",
+        ["counterparty_name_p", "counterparty_name", "source"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_expense_counterparty_name_p", table_name="expense")
+    op.drop_index("ix_expense_counterparty_name", table_name="expense")
+    op.drop_index("ix_expense_parent", table_name="expense")
+    op.drop_index("ix_expense_date_parent", table_name="expense")
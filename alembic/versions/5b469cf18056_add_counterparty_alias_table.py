@@ -0,0 +1,111 @@
+"""add counterparty alias table
+
+Revision ID: 5b469cf18056
+Revises: 89dc3a946242
+Create Date: 2026-10-18 05:21:32.743637
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5b469cf18056"
+down_revision = "89dc3a946242"
+branch_labels = None
+depends_on = None
+
+# NOTE: The SQL of the triggers is collapsed to a single line, like in the
+# model, so that a dump of the DB has each of them on a single line.
+_TRIGGERS = {
+    "counterparty_alias_insert": """
+        CREATE TRIGGER counterparty_alias_insert AFTER INSERT ON expense
+        BEGIN
+            INSERT INTO counterparty_alias (source, counterparty_name_p, counterparty_name, count)
+            SELECT NEW.source, NEW.counterparty_name_p, coalesce(NEW.counterparty_name, ''), 1
+            WHERE NEW.counterparty_name_p != ''
+                AND NEW.counterparty_name IS NOT NEW.counterparty_name_p
+            ON CONFLICT (source, counterparty_name_p, counterparty_name)
+                DO UPDATE SET count = count + 1;
+        END
+    """,
+    "counterparty_alias_update": """
+        CREATE TRIGGER counterparty_alias_update
+        AFTER UPDATE OF source, counterparty_name, counterparty_name_p ON expense
+        WHEN OLD.source IS NOT NEW.source
+            OR OLD.counterparty_name IS NOT NEW.counterparty_name
+            OR OLD.counterparty_name_p IS NOT NEW.counterparty_name_p
+        BEGIN
+            UPDATE counterparty_alias SET count = count - 1
+            WHERE OLD.counterparty_name_p != ''
+                AND OLD.counterparty_name IS NOT OLD.counterparty_name_p
+                AND source = OLD.source
+                AND counterparty_name_p = OLD.counterparty_name_p
+                AND counterparty_name = coalesce(OLD.counterparty_name, '')
+            ;
+            DELETE FROM counterparty_alias
+            WHERE count <= 0
+                AND source = OLD.source
+                AND counterparty_name_p = OLD.counterparty_name_p
+                AND counterparty_name = coalesce(OLD.counterparty_name, '')
+            ;
+            INSERT INTO counterparty_alias (source, counterparty_name_p, counterparty_name, count)
+            SELECT NEW.source, NEW.counterparty_name_p, coalesce(NEW.counterparty_name, ''), 1
+            WHERE NEW.counterparty_name_p != ''
+                AND NEW.counterparty_name IS NOT NEW.counterparty_name_p
+            ON CONFLICT (source, counterparty_name_p, counterparty_name)
+                DO UPDATE SET count = count + 1;
+        END
+    """,
+    "counterparty_alias_delete": """
+        CREATE TRIGGER counterparty_alias_delete AFTER DELETE ON expense
+        BEGIN
+            UPDATE counterparty_alias SET count = count - 1
+            WHERE OLD.counterparty_name_p != ''
+                AND OLD.counterparty_name IS NOT OLD.counterparty_name_p
+                AND source = OLD.source
+                AND counterparty_name_p = OLD.counterparty_name_p
+                AND counterparty_name = coalesce(OLD.counterparty_name, '')
+            ;
+            DELETE FROM counterparty_alias
+            WHERE count <= 0
+                AND source = OLD.source
+                AND counterparty_name_p = OLD.counterparty_name_p
+                AND counterparty_name = coalesce(OLD.counterparty_name, '')
+            ;
+        END
+    """,
+}
+TRIGGERS = {name: " ".join(sql.split()) for name, sql in _TRIGGERS.items()}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "counterparty_alias",
+        sa.Column("source", sa.String(length=10), nullable=False),
+        sa.Column("counterparty_name_p", sa.String(length=100), nullable=False),
+        sa.Column("counterparty_name", sa.String(length=100), nullable=False),
+        sa.Column("count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.PrimaryKeyConstraint("source", "counterparty_name_p", "counterparty_name"),
+    )
+    # NOTE: Names are added in the order they were first used, which breaks
+    # ties between names used equally often.
+    op.execute(
+        """
+        INSERT INTO counterparty_alias (source, counterparty_name_p, counterparty_name, count)
+        SELECT source, counterparty_name_p, coalesce(counterparty_name, ''), count(*)
+        FROM expense
+        WHERE counterparty_name_p != '' AND counterparty_name IS NOT counterparty_name_p
+        GROUP BY source, counterparty_name_p, coalesce(counterparty_name, '')
+        ORDER BY min(rowid)
+        """
+    )
+    for trigger in TRIGGERS.values():
+        op.execute(trigger)
+
+
+def downgrade() -> None:
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER {name}")
+    op.drop_table("counterparty_alias")
@@ -0,0 +1,186 @@
+"""add monthly summary table
+
+Revision ID: 7c2d9e4f1a63
+Revises: e3f1c2a9b7d4
+Create Date: 2026-10-18 06:24:51.318204
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7c2d9e4f1a63"
+down_revision = "e3f1c2a9b7d4"
+branch_labels = None
+depends_on = None
+
+# NOTE: The SQL of the triggers is built like in the model at this revision,
+# and collapsed to a single line. It can't use "%", like in the model.
+
+# The row itself, with the date and category of the expense it is summarized
+# under: its own, or its parent's when it is a child of a top-level expense.
+_SUMMARY_ROW = """
+    SELECT
+        CASE WHEN coalesce({row}.parent, '') = '' THEN {row}.date ELSE p.date END AS date,
+        CASE WHEN coalesce({row}.parent, '') = '' THEN {row}.category_id ELSE p.category_id END
+            AS category_id,
+        {row}.ignore AS ignore,
+        {row}.amount_paise AS amount_paise
+    FROM (SELECT 1) LEFT JOIN expense p ON p.id = {row}.parent AND coalesce(p.parent, '') = ''
+"""
+# The children of the row, summarized under it if it is a top-level expense
+_SUMMARY_CHILDREN = """
+    SELECT {row}.date AS date, {row}.category_id AS category_id, c.ignore AS ignore,
+        c.amount_paise AS amount_paise
+    FROM expense c
+    WHERE c.parent = {row}.id AND coalesce({row}.parent, '') = ''
+"""
+_SUMMARY_GROUPS = """
+    SELECT
+        CAST(substr(date, 1, 4) AS INTEGER) AS year,
+        CAST(substr(date, 6, 2) AS INTEGER) AS month,
+        coalesce(category_id, 0) AS category_id,
+        ignore,
+        sum(amount_paise) AS amount_paise,
+        count(*) AS count,
+        max(amount_paise) AS max_amount_paise
+    FROM ({rows})
+    WHERE date IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+"""
+_ADD_SUMMARY = f"""
+    INSERT INTO monthly_summary
+        (year, month, category_id, ignore, amount_paise, count, max_amount_paise)
+    {_SUMMARY_GROUPS}
+    ON CONFLICT (year, month, category_id, ignore) DO UPDATE SET
+        amount_paise = amount_paise + excluded.amount_paise,
+        count = count + excluded.count,
+        max_amount_paise = max(max_amount_paise, excluded.max_amount_paise);
+"""
+_REMOVE_SUMMARY = f"""
+    UPDATE monthly_summary SET
+        amount_paise = monthly_summary.amount_paise - s.amount_paise,
+        count = monthly_summary.count - s.count,
+        max_amount_paise = CASE
+            WHEN s.max_amount_paise < monthly_summary.max_amount_paise
+            THEN monthly_summary.max_amount_paise
+        END
+    FROM ({_SUMMARY_GROUPS}) AS s
+    WHERE monthly_summary.year = s.year
+        AND monthly_summary.month = s.month
+        AND monthly_summary.category_id = s.category_id
+        AND monthly_summary.ignore = s.ignore;
+"""
+_SUMMARY_MONTH = "(monthly_summary.year || '-' || substr('0' || monthly_summary.month, -2))"
+_FIX_SUMMARY = f"""
+    DELETE FROM monthly_summary WHERE count <= 0;
+    UPDATE monthly_summary SET max_amount_paise = (
+        SELECT max(amount_paise) FROM (
+            SELECT e.amount_paise FROM expense e
+            WHERE e.date >= {_SUMMARY_MONTH} AND e.date < {_SUMMARY_MONTH} || '-32'
+                AND coalesce(e.parent, '') = ''
+                AND coalesce(e.category_id, 0) = monthly_summary.category_id
+                AND e.ignore = monthly_summary.ignore
+            UNION ALL
+            SELECT c.amount_paise FROM expense p JOIN expense c ON c.parent = p.id
+            WHERE p.date >= {_SUMMARY_MONTH} AND p.date < {_SUMMARY_MONTH} || '-32'
+                AND coalesce(p.parent, '') = ''
+                AND coalesce(p.category_id, 0) = monthly_summary.category_id
+                AND c.ignore = monthly_summary.ignore
+        )
+    )
+    WHERE max_amount_paise IS NULL;
+"""  # noqa: S608
+
+
+def _summary_rows(row: str, children: bool = True) -> str:
+    rows = [_SUMMARY_ROW, _SUMMARY_CHILDREN] if children else [_SUMMARY_ROW]
+    return " UNION ALL ".join(rows).format(row=row)
+
+
+_TRIGGERS = {
+    "monthly_summary_insert": f"""
+        CREATE TRIGGER monthly_summary_insert AFTER INSERT ON expense
+        BEGIN {_ADD_SUMMARY.format(rows=_summary_rows("NEW"))} END
+    """,
+    "monthly_summary_update": f"""
+        CREATE TRIGGER monthly_summary_update
+        AFTER UPDATE OF date, category_id, ignore, amount_paise, parent ON expense
+        WHEN OLD.date IS NOT NEW.date
+            OR OLD.category_id IS NOT NEW.category_id
+            OR OLD.ignore IS NOT NEW.ignore
+            OR OLD.amount_paise IS NOT NEW.amount_paise
+            OR OLD.parent IS NOT NEW.parent
+        BEGIN
+            {_REMOVE_SUMMARY.format(rows=_summary_rows("OLD", children=False))}
+            {_ADD_SUMMARY.format(rows=_summary_rows("NEW", children=False))}
+            {_FIX_SUMMARY}
+        END
+    """,
+    "monthly_summary_update_children": f"""
+        CREATE TRIGGER monthly_summary_update_children
+        AFTER UPDATE OF date, category_id, parent ON expense
+        WHEN OLD.date IS NOT NEW.date
+            OR OLD.category_id IS NOT NEW.category_id
+            OR OLD.parent IS NOT NEW.parent
+        BEGIN
+            {_REMOVE_SUMMARY.format(rows=_SUMMARY_CHILDREN.format(row="OLD"))}
+            {_ADD_SUMMARY.format(rows=_SUMMARY_CHILDREN.format(row="NEW"))}
+            {_FIX_SUMMARY}
+        END
+    """,
+    "monthly_summary_delete": f"""
+        CREATE TRIGGER monthly_summary_delete AFTER DELETE ON expense
+        BEGIN {_REMOVE_SUMMARY.format(rows=_summary_rows("OLD"))} {_FIX_SUMMARY} END
+    """,
+}
+TRIGGERS = {name: " ".join(sql.split()) for name, sql in _TRIGGERS.items()}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "monthly_summary",
+        sa.Column("year", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("month", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("category_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("ignore", sa.Boolean(), nullable=False),
+        sa.Column("amount_paise", sa.BigInteger(), server_default=sa.text("0"), nullable=False),
+        sa.Column("count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("max_amount_paise", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("year", "month", "category_id", "ignore"),
+    )
+    # NOTE: Children of top-level expenses are summarized with their parent
+    op.execute(
+        """
+        INSERT INTO monthly_summary
+            (year, month, category_id, ignore, amount_paise, count, max_amount_paise)
+        SELECT
+            CAST(substr(date, 1, 4) AS INTEGER),
+            CAST(substr(date, 6, 2) AS INTEGER),
+            coalesce(category_id, 0),
+            ignore,
+            sum(amount_paise),
+            count(*),
+            max(amount_paise)
+        FROM (
+            SELECT e.date, e.category_id, e.ignore, e.amount_paise
+            FROM expense e
+            WHERE coalesce(e.parent, '') = ''
+            UNION ALL
+            SELECT p.date, p.category_id, c.ignore, c.amount_paise
+            FROM expense c JOIN expense p ON p.id = c.parent
+            WHERE coalesce(p.parent, '') = ''
+        )
+        GROUP BY 1, 2, 3, 4
+        """
+    )
+    for trigger in TRIGGERS.values():
+        op.execute(trigger)
+
+
+def downgrade() -> None:
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER {name}")
+    op.drop_table("monthly_summary")
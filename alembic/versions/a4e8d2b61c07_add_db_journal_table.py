@@ -0,0 +1,103 @@
+"""add db journal table
+
+Revision ID: a4e8d2b61c07
+Revises: 7c2d9e4f1a63
+Create Date: 2026-10-18 07:12:09.524871
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a4e8d2b61c07"
+down_revision = "7c2d9e4f1a63"
+branch_labels = None
+depends_on = None
+
+# NOTE: The SQL of the triggers is built like in the model at this revision,
+# and collapsed to a single line. The id is journaled last, since the other
+# columns of a row are recorded under its old id.
+_JOURNAL_COLUMNS = [
+    "date",
+    "details",
+    "amount_paise",
+    "ignore",
+    "category_id",
+    "source",
+    "source_file",
+    "source_line",
+    "transaction_id",
+    "transaction_type",
+    "counterparty_name",
+    "counterparty_name_p",
+    "counterparty_type",
+    "counterparty_bank",
+    "counterparty_bank_p",
+    "remarks",
+    "parent",
+    "reviewed",
+    "id",
+]
+_ADD_ENTRY = "INSERT INTO db_journal (table_name, row_id, column_name, old_value, new_value)"
+_JOURNAL_COLUMN = f"""
+    {_ADD_ENTRY}
+    SELECT 'expense', OLD.id, '{{column}}', json_quote(OLD.{{column}}), json_quote(NEW.{{column}})
+    WHERE OLD.{{column}} IS NOT NEW.{{column}};
+"""
+_OLD_ROW = ", ".join(f"'{column}', OLD.{column}" for column in _JOURNAL_COLUMNS)
+
+_TRIGGERS = {
+    "db_journal_expense_insert": f"""
+        CREATE TRIGGER db_journal_expense_insert AFTER INSERT ON expense
+        BEGIN {_ADD_ENTRY} VALUES ('expense', NEW.id, NULL, NULL, NULL); END
+    """,  # noqa: S608
+    "db_journal_expense_update": f"""
+        CREATE TRIGGER db_journal_expense_update AFTER UPDATE ON expense
+        BEGIN {"".join(_JOURNAL_COLUMN.format(column=c) for c in _JOURNAL_COLUMNS)} END
+    """,
+    "db_journal_expense_delete": f"""
+        CREATE TRIGGER db_journal_expense_delete AFTER DELETE ON expense
+        BEGIN {_ADD_ENTRY} VALUES ('expense', OLD.id, NULL, json_object({_OLD_ROW}), NULL); END
+    """,
+    "db_journal_expense_tag_insert": f"""
+        CREATE TRIGGER db_journal_expense_tag_insert AFTER INSERT ON expense_tag
+        BEGIN
+            {_ADD_ENTRY}
+            VALUES ('expense_tag', NEW.expense_id, 'tag_id', NULL, json_quote(NEW.tag_id));
+        END
+    """,  # noqa: S608
+    "db_journal_expense_tag_delete": f"""
+        CREATE TRIGGER db_journal_expense_tag_delete AFTER DELETE ON expense_tag
+        BEGIN
+            {_ADD_ENTRY}
+            VALUES ('expense_tag', OLD.expense_id, 'tag_id', json_quote(OLD.tag_id), NULL);
+        END
+    """,
+}
+TRIGGERS = {name: " ".join(sql.split()) for name, sql in _TRIGGERS.items()}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "db_journal",
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column(
+            "timestamp", sa.DateTime(), server_default=sa.text("CURRENT_TIMESTAMP"), nullable=False
+        ),
+        sa.Column("table_name", sa.String(length=20), nullable=False),
+        sa.Column("row_id", sa.String(length=40), nullable=False),
+        sa.Column("column_name", sa.String(length=40), nullable=True),
+        sa.Column("old_value", sa.Text(), nullable=True),
+        sa.Column("new_value", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("seq"),
+    )
+    for trigger in TRIGGERS.values():
+        op.execute(trigger)
+
+
+def downgrade() -> None:
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER {name}")
+    op.drop_table("db_journal")
@@ -0,0 +1,37 @@
+"""store amount in paise
+
+Revision ID: e3f1c2a9b7d4
+Revises: 14b8581020e6
+Create Date: 2026-10-18 05:52:14.906113
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e3f1c2a9b7d4"
+down_revision = "14b8581020e6"
+branch_labels = None
+depends_on = None
+
+
+# NOTE: The columns are added and dropped in place, instead of recreating the
+# table in batch mode, which would drop the triggers on the table.
+def upgrade() -> None:
+    op.add_column(
+        "expense",
+        sa.Column("amount_paise", sa.BigInteger(), server_default=sa.text("0"), nullable=False),
+    )
+    op.execute("UPDATE expense SET amount_paise = CAST(round(amount * 100) AS INTEGER)")
+    op.drop_column("expense", "amount")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "expense",
+        sa.Column("amount", sa.Float(), server_default=sa.text("0"), nullable=False),
+    )
+    op.execute("UPDATE expense SET amount = amount_paise / 100.0")
+    op.drop_column("expense", "amount_paise")
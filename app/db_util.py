@@ -1,58 +1,200 @@
+import json
 import os
 import sqlite3
 import tempfile
-from collections import Counter
-from dataclasses import fields
+import threading
+from collections import Counter, OrderedDict, defaultdict, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from hashlib import sha1
+from itertools import chain, islice
 from pathlib import Path
-from typing import cast
+from typing import Any, NamedTuple, cast
 
-from sqlalchemy import create_engine, or_, text
+from sqlalchemy import Row, bindparam, create_engine, event, false, inspect, or_, text, update
 from sqlalchemy.engine import Engine
-from sqlalchemy.orm import Query, sessionmaker
+from sqlalchemy.orm import InstanceState, Query, sessionmaker
 from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import NullPool, Pool, QueuePool, SingletonThreadPool
 
 from app.data import CATEGORIES, create_categories, create_tags
-from app.model import Category, Expense, Tag
+from app.model import DB_JOURNAL_TRIGGERS, Category, Expense, Tag
 from app.scrapers import ALL_SCRAPERS
+from app.scrapers.base import Source, Transaction
 from app.util import CONFIG, DATA_REPO_PATH
 
 ROOT = Path(__file__).parent.parent
 DB_NAME = os.getenv("EXPENSES_DB", "expenses.db")
 DB_PATH = ROOT.joinpath(DB_NAME)
+# State of the DB and its dump after the last sync with the data repo
+DB_SYNC_STATE_PATH = DB_PATH.with_name(f"{DB_PATH.name}-sync.json")
+PARSE_CACHE_SIZE = int(str(CONFIG.get("parse_cache_size", 50_000)))
+DB_POOL = str(CONFIG.get("db_pool", "queue"))
+DB_POOL_SIZE = int(str(CONFIG.get("db_pool_size", 5)))
+POOL_CLASSES: dict[str, type[Pool]] = {
+    "queue": QueuePool,
+    "singleton": SingletonThreadPool,
+    "null": NullPool,
+}
+
+# PRAGMAs set on every new connection to a SQLite DB, for each profile. WAL
+# lets the dashboard read while statements are being ingested, and is safe
+# with synchronous=normal (the last commits may be lost on a power failure,
+# but the DB is not corrupted).
+SQLITE_PROFILES: dict[str, dict[str, str | int]] = {
+    "default": {},
+    "performance": {
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "mmap_size": 256 * 2**20,
+        # NOTE: Negative values are in KiB, instead of pages
+        "cache_size": -64 * 2**10,
+        "temp_store": "memory",
+        "busy_timeout": 10_000,
+    },
+}
+SQLITE_PROFILE = str(CONFIG.get("sqlite_profile", "performance"))
+# PRAGMAs that override the values of the profile. NOTE: TOML allows values
+# of any type, and they are checked by get_sqlite_pragmas.
+SQLITE_PRAGMAS = cast(dict[str, Any], CONFIG.get("sqlite_pragmas", {}))
+
+# Format of the DB dump in the data repo: a single "sql" file with the whole
+# DB, or a "sharded" directory with a file per table (and per month, for the
+# tables in DUMP_SHARDS), and the name of the dump for each format.
+DB_DUMP_FORMAT = str(CONFIG.get("db_dump_format", "sql"))
+DB_DUMP_NAMES = {"sql": "db.csv", "sharded": "db"}
+# SQL for the month (YYYY-MM) of each row, for the tables dumped by month
+DUMP_SHARDS = {
+    "expense": "substr(date, 1, 7)",
+    "expense_tag": "(SELECT substr(e.date, 1, 7) FROM expense e WHERE e.id = expense_id)",
+    "monthly_summary": "year || '-' || substr('0' || month, -2)",
+}
+DUMP_SCHEMA_FILE = "schema.sql"
+# Journal of the edits of the expenses since the DB was last dumped, with an
+# entry per line, next to the dump. Syncing the DB after a few edits appends
+# them to the journal, instead of rewriting the whole dump. The dump is
+# rewritten, and the journal removed, when the journal would have more than
+# DB_JOURNAL_MAX_ENTRIES entries (0 disables the journal), or when the DB has
+# changes that are not journaled (e.g., in the categories or the schema).
+DB_JOURNAL_NAME = "db-journal.jsonl"
+DB_JOURNAL_MAX_ENTRIES = int(str(CONFIG.get("db_journal_max_entries", 1000)))
+# Tables whose changes are journaled (see DB_JOURNAL_TRIGGERS), and the tables
+# kept up to date by triggers on them, which update them on replay too
+DB_JOURNALED_TABLES = {"expense", "expense_tag"}
+DB_JOURNAL_DERIVED_TABLES = {"counterparty_alias", "db_journal", "monthly_summary"}
+
+# Engines and session factories shared by the process, by DB URL
+_ENGINES: dict[str, Engine] = {}
+_SESSION_FACTORIES: dict[str, sessionmaker[Session]] = {}
+_ENGINES_LOCK = threading.RLock()
+
+
+class ParseCache:
+    """Bounded LRU cache of the transactions parsed from the details of expenses.
+
+    The scrapers parse a transaction only from the details of an expense, so
+    the cache is keyed by the source name and the details. The cached
+    transactions are shared between expenses, and must not be modified. A
+    `maxsize` of 0 disables the cache.
+
+    """
+
+    def __init__(self, maxsize: int = PARSE_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._transactions: OrderedDict[tuple[str, str], Transaction] = OrderedDict()
+
+    def parse_details(self, source_cls: type[Source], expense: Expense) -> Transaction:
+        if self.maxsize <= 0:
+            self.misses += 1
+            return source_cls.parse_details(expense)
+
+        key = (source_cls.name, str(expense.details))
+        transaction = self._transactions.get(key)
+        if transaction is not None:
+            self.hits += 1
+            self._transactions.move_to_end(key)
+            return transaction
+
+        self.misses += 1
+        transaction = source_cls.parse_details(expense)
+        self._transactions[key] = transaction
+        if len(self._transactions) > self.maxsize:
+            self._transactions.popitem(last=False)
+        return transaction
+
+    def resize(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        while len(self._transactions) > max(maxsize, 0):
+            self._transactions.popitem(last=False)
+
+    def clear(self) -> None:
+        self._transactions.clear()
+        self.hits = self.misses = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"ParseCache(hits={self.hits}, misses={self.misses}, "
+            f"size={len(self._transactions)}, maxsize={self.maxsize})"
+        )
+
+
+# Cache used by parse_details_for_expenses in the current process
+PARSE_CACHE = ParseCache()
 
 
 def category_names_lookup() -> dict[str, int]:
-    session = get_sqlalchemy_session()
-    categories = session.query(Category).all()
+    with get_sqlalchemy_session() as session:
+        categories = session.query(Category).all()
     return {str(cat.name).lower(): cast(int, cat.id) for cat in categories}
 
 
-def counterparty_names_lookup() -> dict[tuple[str, str], str]:
-    engine = get_db_engine()
-    with engine.connect() as conn:
-        names = conn.execute(
-            text("SELECT source, counterparty_name_p, counterparty_name FROM expense")
-        ).fetchall()
-    lookup: dict[tuple[str, str], list[str]] = {}
-    for source, parsed_name, name in names:
-        if not (parsed_name and parsed_name != name):
-            continue
-        key = (source, parsed_name)
-        value = lookup.setdefault(key, [])
-        value.append(name)
+class CounterpartyAliases:
+    """Most frequently used name for each parsed counterparty name, by source.
+
+    The names are read from the counterparty_alias table with a point read
+    for each (source, parsed name), and remembered for the lifetime of the
+    object.
+
+    """
 
-    return {key: Counter(value).most_common(1)[0][0] for key, value in lookup.items()}
+    QUERY = text(
+        """
+        SELECT counterparty_name FROM counterparty_alias
+        WHERE source = :source AND counterparty_name_p = :name_p
+        ORDER BY count DESC, rowid
+        LIMIT 1
+        """
+    )
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+        self._names: dict[tuple[str, str], str | None] = {}
+
+    def get(self, key: tuple[str, str]) -> str | None:
+        if key not in self._names:
+            source, name_p = key
+            with self.engine.connect() as conn:
+                params = {"source": source, "name_p": name_p}
+                self._names[key] = conn.execute(self.QUERY, params).scalar()
+        return self._names[key]
+
+
+def counterparty_names_lookup() -> CounterpartyAliases:
+    return CounterpartyAliases(get_db_engine())
 
 
 def ensure_categories_created() -> None:
-    session = get_sqlalchemy_session()
-    return create_categories(session, get_config_categories())
+    with get_sqlalchemy_session() as session:
+        create_categories(session, get_config_categories())
 
 
 def ensure_tags_created() -> None:
-    session = get_sqlalchemy_session()
     tags = cast(list[str], CONFIG.get("tags", []))
-    return create_tags(session, tags)
+    with get_sqlalchemy_session() as session:
+        create_tags(session, tags)
 
 
 def get_config_categories() -> list[str]:
@@ -65,58 +207,307 @@ def get_db_url() -> str:
     return f"sqlite:///{DB_PATH}"
 
 
-def get_db_engine() -> Engine:
-    return create_engine(get_db_url())
+def get_pool_options(pool: str = DB_POOL, pool_size: int = DB_POOL_SIZE) -> dict[str, Any]:
+    try:
+        pool_class = POOL_CLASSES[pool]
+    except KeyError:
+        raise ValueError(
+            f"Unknown db_pool {pool!r}, expected one of: {', '.join(POOL_CLASSES)}"
+        ) from None
+    if pool_class is NullPool:
+        return {"poolclass": pool_class}
+    return {"poolclass": pool_class, "pool_size": pool_size}
+
+
+def get_sqlite_pragmas(
+    profile: str = SQLITE_PROFILE, overrides: dict[str, Any] = SQLITE_PRAGMAS
+) -> dict[str, str | int]:
+    try:
+        pragmas = {**SQLITE_PROFILES[profile], **overrides}
+    except KeyError:
+        raise ValueError(
+            f"Unknown sqlite_profile {profile!r}, expected one of: {', '.join(SQLITE_PROFILES)}"
+        ) from None
+    for name, value in pragmas.items():
+        # NOTE: The values are put in the SQL, so only integers and keywords
+        # (e.g., "wal") are allowed, and any other type (e.g., a float) isn't
+        valid_value = isinstance(value, int) or (isinstance(value, str) and value.isidentifier())
+        if not name.isidentifier() or not valid_value:
+            raise ValueError(f"Invalid SQLite pragma: {name} = {value!r}")
+    return pragmas
+
+
+def set_sqlite_pragmas(connection: sqlite3.Connection, pragmas: dict[str, str | int]) -> None:
+    cursor = connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def get_db_engine(url: str | None = None) -> Engine:
+    """Engine for the DB at `url` (default: the expenses DB), shared by the process."""
+    url = url or get_db_url()
+    with _ENGINES_LOCK:
+        if url not in _ENGINES:
+            engine = create_engine(url, **get_pool_options())
+            if engine.dialect.name == "sqlite":
+                pragmas = get_sqlite_pragmas()
+                event.listen(engine, "connect", lambda conn, _: set_sqlite_pragmas(conn, pragmas))
+            _ENGINES[url] = engine
+        return _ENGINES[url]
+
+
+def get_db_last_modified() -> float:
+    """Last modified time of the DB, including commits still in its WAL file."""
+    wal_path = DB_PATH.with_name(f"{DB_PATH.name}-wal")
+    # NOTE: An empty WAL file is created when the DB is opened, and has no commits
+    stats = [path.stat() for path in (DB_PATH, wal_path) if path.exists()]
+    return max(stat.st_mtime for stat in stats if stat.st_size > 0 or stat is stats[0])
+
+
+def get_session_factory(url: str | None = None) -> sessionmaker[Session]:
+    url = url or get_db_url()
+    with _ENGINES_LOCK:
+        if url not in _SESSION_FACTORIES:
+            _SESSION_FACTORIES[url] = sessionmaker(bind=get_db_engine(url))
+        return _SESSION_FACTORIES[url]
 
 
 def get_sqlalchemy_session() -> Session:
-    engine = get_db_engine()
-    return sessionmaker(bind=engine)()
+    return get_session_factory()()
+
+
+def reset_db_engines() -> None:
+    """Dispose the shared engines and session factories.
+
+    Pooled connections keep using a DB file even after it is replaced or
+    deleted, so this must be called whenever that happens (e.g., in tests
+    and benchmarks that recreate the DB).
+
+    """
+    with _ENGINES_LOCK:
+        engines = list(_ENGINES.values())
+        _ENGINES.clear()
+        _SESSION_FACTORIES.clear()
+    for engine in engines:
+        engine.dispose()
 
 
-def parse_details_for_expenses(expenses: list[Expense] | Query[Expense], n_debug: int = 0) -> None:
+def parse_details_for_expenses(
+    expenses: list[Expense] | Query[Expense], n_debug: int = 0, dry_run: bool = False
+) -> Counter[str]:
     """Parse details for an expense object and update other fields.
 
     NOTE: This function could potentially be called on old data. Try not to
     clobber fields which may have been hand edited...
 
+    Only the fields whose parsed values differ from the stored values are set
+    on expenses already in the DB, so that unchanged rows are not updated.
+    With `dry_run`, the expenses are not modified at all.
+
+    Returns the number of expenses changed, for each field.
+
     """
-    categories = category_names_lookup()
-    counterparty_lookup = counterparty_names_lookup()
-    examples = []
-    for i, expense in enumerate(expenses):
+    lookups = ParseLookups.load()
+    changed: Counter[str] = Counter()
+    examples: list[tuple[Expense, dict[str, Any]]] = []
+    for expense in expenses:
         source_cls = ALL_SCRAPERS[str(expense.source)]
-        transaction = source_cls.parse_details(expense)
+        transaction = PARSE_CACHE.parse_details(source_cls, expense)
+        values = get_parsed_values(transaction, str(expense.source), expense.category_id, lookups)
 
-        # Copy attributes from parsed Transaction dataclass to Expense object
-        attrs = {f.name: f.name for f in fields(transaction)}
-        attrs["counterparty_name_p"] = "counterparty_name"
-        attrs["counterparty_bank_p"] = "counterparty_bank"
-        for expense_attr, transaction_attr in attrs.items():
-            setattr(expense, expense_attr, getattr(transaction, transaction_attr))
-
-        # Change counterparty_name to most frequently used name on similar transactions
-        name_p = str(expense.counterparty_name_p)
-        lookup_key = (str(expense.source) or "", name_p or "")
-        lookup_value = counterparty_lookup.get(lookup_key)
-        if name_p and lookup_value:
-            expense.counterparty_name = lookup_value
-
-        # Set category id if category_name or remarks exactly match a category id.
-        key = (expense.category is not None and str(expense.category.name).strip().lower()) or (
-            expense.remarks is not None and expense.remarks.strip().lower() or ""
-        )
-        expense.category_id = categories.get(key, expense.category_id)
+        # NOTE: New expenses get every value, since their unset columns would
+        # otherwise be filled with the column defaults on insert.
+        if cast(InstanceState[Expense], inspect(expense)).has_identity:
+            values = {
+                name: value for name, value in values.items() if getattr(expense, name) != value
+            }
+        changed.update(values.keys())
+        if values and len(examples) < n_debug:
+            examples.append((expense, values))
+        if not dry_run:
+            for name, value in values.items():
+                setattr(expense, name, value)
 
-        if i < n_debug:
-            examples.append(expense)
-
-    for expense in examples:
+    for expense, values in examples:
         print(expense)
+        for name, value in values.items():
+            print(f"  {name}: {value!r}")
         print("#" * 40)
+    return changed
+
+
+# Columns of an expense that are set from its parsed details
+PARSED_COLUMNS = [
+    "transaction_id",
+    "transaction_type",
+    "counterparty_name",
+    "counterparty_type",
+    "counterparty_bank",
+    "remarks",
+    "ignore",
+    "counterparty_name_p",
+    "counterparty_bank_p",
+    "category_id",
+]
+
+
+@dataclass
+class ParseLookups:
+    """Lookups used to set the counterparty name and category of an expense."""
+
+    counterparties: CounterpartyAliases
+    categories: dict[str, int]
+    category_names: dict[int, str]
+
+    @classmethod
+    def load(cls) -> "ParseLookups":
+        categories = category_names_lookup()
+        return cls(
+            counterparties=counterparty_names_lookup(),
+            categories=categories,
+            category_names={id_: name for name, id_ in categories.items()},
+        )
+
+
+class ExpenseChange(NamedTuple):
+    id: str
+    details: str
+    old: dict[str, Any]
+    new: dict[str, Any]
+
+
+def get_parsed_values(
+    transaction: Transaction, source: str, category_id: int | None, lookups: ParseLookups
+) -> dict[str, Any]:
+    """Values of the PARSED_COLUMNS of an expense, from its parsed transaction.
+
+    These are the same values that `parse_details_for_expenses` sets on an
+    Expense object, computed without loading the object.
+
+    """
+    values = {
+        name: getattr(transaction, name)
+        for name in PARSED_COLUMNS
+        if name in Transaction.__dataclass_fields__
+    }
+    values["counterparty_name_p"] = transaction.counterparty_name
+    values["counterparty_bank_p"] = transaction.counterparty_bank
+
+    # Change counterparty_name to most frequently used name on similar transactions
+    name_p = str(values["counterparty_name_p"])
+    lookup_value = lookups.counterparties.get((source or "", name_p or ""))
+    if name_p and lookup_value:
+        values["counterparty_name"] = lookup_value
+
+    # Set category id if category_name or remarks exactly match a category id.
+    category_name = lookups.category_names.get(category_id) if category_id is not None else None
+    remarks = values["remarks"]
+    key = (category_name is not None and category_name.strip().lower()) or (
+        remarks is not None and remarks.strip().lower() or ""
+    )
+    values["category_id"] = lookups.categories.get(key, category_id)
+    return values
+
+
+def parse_details_rows(rows: list[tuple[str, str]]) -> list[Transaction]:
+    """Parse the details of (source, details) rows, e.g., in a worker process."""
+    return [
+        PARSE_CACHE.parse_details(ALL_SCRAPERS[source], Expense(details=details))
+        for source, details in rows
+    ]
+
+
+def reparse_expenses(
+    session: Session, filters: dict[str, Any], jobs: int = 1, batch_size: int = 1000
+) -> Iterator[ExpenseChange]:
+    """Reparse the details of the expenses matching `filters`, in batches.
+
+    The matching rows are streamed from the DB in batches of `batch_size`,
+    and their details are parsed in a pool of `jobs` worker processes, with
+    a few batches in flight at a time. Nothing is written to the DB.
+
+    Yields the old and new values of the changed columns, for each expense
+    whose parsed columns changed.
+
+    """
+    columns = [getattr(Expense, name) for name in ["id", "source", "details", *PARSED_COLUMNS]]
+    query = session.query(*columns).filter_by(**filters).order_by(Expense.id)
+    rows = iter(query.yield_per(batch_size))
+    batches = iter(lambda: list(islice(rows, batch_size)), [])
+    lookups = ParseLookups.load()
+
+    def get_changes(
+        batch: list[Row[Any]], transactions: list[Transaction]
+    ) -> Iterator[ExpenseChange]:
+        for row, transaction in zip(batch, transactions, strict=True):
+            new = get_parsed_values(transaction, row.source, row.category_id, lookups)
+            old = {name: getattr(row, name) for name in PARSED_COLUMNS}
+            changed = [name for name in PARSED_COLUMNS if old[name] != new[name]]
+            if changed:
+                yield ExpenseChange(
+                    id=row.id,
+                    details=row.details,
+                    old={name: old[name] for name in changed},
+                    new={name: new[name] for name in changed},
+                )
+
+    if jobs <= 1:
+        for batch in batches:
+            yield from get_changes(
+                batch, parse_details_rows([(r.source, r.details) for r in batch])
+            )
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending: deque[tuple[list[Row[Any]], Future[list[Transaction]]]] = deque()
+        for batch in batches:
+            rows_to_parse = [(r.source, r.details) for r in batch]
+            pending.append((batch, executor.submit(parse_details_rows, rows_to_parse)))
+            if len(pending) >= 2 * jobs:
+                parsed_batch, future = pending.popleft()
+                yield from get_changes(parsed_batch, future.result())
+        while pending:
+            parsed_batch, future = pending.popleft()
+            yield from get_changes(parsed_batch, future.result())
+
+
+def write_expense_changes(
+    session: Session,
+    changes: Iterable[ExpenseChange],
+    batch_size: int = 1000,
+    modify_reviewed: bool = False,
+) -> int:
+    """Write the new values of changed columns, in batched UPDATEs.
+
+    Expenses that are (now) reviewed are left untouched unless
+    `modify_reviewed` is set. Returns the number of updated rows.
+
+    """
+    # Group the changes by the set of changed columns, for executemany
+    groups: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+    for change in changes:
+        groups.setdefault(tuple(change.new), []).append({"_id": change.id, **change.new})
+
+    table = Expense.__table__
+    conn = session.connection()
+    rows = 0
+    for names, params in groups.items():
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("_id"))
+            .values({name: bindparam(name) for name in names})
+        )
+        if not modify_reviewed:
+            statement = statement.where(table.c.reviewed == false())
+        for start in range(0, len(params), batch_size):
+            result = conn.execute(statement, params[start : start + batch_size])
+            rows += result.rowcount
+    return rows
 
 
 def update_similar_counterparty_names(session: Session, expense: Expense, name: str) -> None:
+    # NOTE: The counterparty_alias table is updated by the triggers on expense
     expenses = session.query(Expense).filter(
         Expense.counterparty_name_p == expense.counterparty_name_p,
         Expense.counterparty_name == expense.counterparty_name,
@@ -132,13 +523,12 @@ def update_similar_counterparty_categories(
     all_categories: dict[int, Category],
 ) -> None:
     name = expense.counterparty_name
-    expenses = session.query(Expense).where(
-        or_(
-            Expense.counterparty_name == name,
-            Expense.parent == expense.id,
-            Expense.id == expense.parent,
-        )
-    )
+    conditions = [Expense.counterparty_name == name, Expense.parent == expense.id]
+    # NOTE: "id IS NULL" never matches, and would stop SQLite from using the
+    # indexes for the other conditions
+    if expense.parent is not None:
+        conditions.append(Expense.id == expense.parent)
+    expenses = session.query(Expense).where(or_(*conditions))
     name_map = {str(cat.name): cat.id for cat in all_categories.values()}
     category_id = name_map[category_name] if category_name is not None else None
     expenses.update({"category_id": category_id}, synchronize_session=False)
@@ -171,59 +561,513 @@ def dump_db_to_csv(path: Path) -> None:
     print(f"Dumped database to {path}")
 
 
+def iter_dump_statements(path: Path) -> Iterator[str]:
+    """The SQL statements in a dump file, which may span multiple lines."""
+    statement = ""
+    with path.open() as f:
+        for line in f:
+            statement += line
+            if sqlite3.complete_statement(statement):
+                yield statement
+                statement = ""
+    # NOTE: An incomplete statement at the end (of a truncated dump) fails to run
+    if statement.strip():
+        yield statement
+
+
+def restore_db(db_path: Path, statements: Iterable[str]) -> None:
+    """Run the statements of a dump on a new DB at `db_path`, in one transaction.
+
+    The statements are run as they are read, by the sqlite3 module, without
+    SQLAlchemy parsing them for parameters. Since the DB is new, journaling
+    and syncing are turned off during the restore, and the partial DB is
+    removed if the restore fails.
+
+    """
+    if db_path.exists() and db_path.stat().st_size > 0:
+        raise ValueError(f"Cannot restore a dump into an existing DB: {db_path}")
+
+    # NOTE: Each statement of a dump is different, and caching them is a waste
+    connection = sqlite3.connect(db_path, isolation_level=None, cached_statements=0)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        cursor = connection.cursor()
+        cursor.execute("BEGIN")
+        for statement in statements:
+            # The dumps of iterdump start and end their own transaction
+            if statement.strip() not in {"BEGIN TRANSACTION;", "COMMIT;"}:
+                cursor.execute(statement)
+        cursor.execute("COMMIT")
+    except BaseException:
+        connection.close()
+        db_path.unlink(missing_ok=True)
+        raise
+    connection.close()
+
+
 def load_db_from_csv(db_path: Path, db_dump_path: Path) -> None:
     print(f"Loading DB from {db_dump_path}")
+    # NOTE: The indexes and triggers are at the end of the dump, after the rows
+    restore_db(db_path, iter_dump_statements(db_dump_path))
+
+
+def get_dump_shards(conn: sqlite3.Connection) -> dict[str, str]:
+    """A sharded dump of the DB, as the text of each file by its relative path.
+
+    The schema is dumped into DUMP_SCHEMA_FILE, and the rows of each table
+    into a file named after it, or a file per month in a directory named after
+    it, as INSERT statements sorted by the primary key. The statistics of
+    ANALYZE (sqlite_stat1) are not dumped.
+
+    """
+    schema = conn.execute(
+        """
+        SELECT type, name, sql FROM sqlite_master
+        WHERE sql NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY type != 'table', type, name
+        """
+    ).fetchall()
+    shards: dict[str, list[str]] = defaultdict(list)
+    shards[DUMP_SCHEMA_FILE] = [f"{sql};" for _, _, sql in schema]
+    for table in (name for type_, name, _ in schema if type_ == "table"):
+        info = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+        values = " || ',' || ".join(f'quote("{column[1]}")' for column in info)
+        primary_key = [f'"{column[1]}"' for column in sorted(info, key=lambda c: c[5]) if column[5]]
+        month = DUMP_SHARDS.get(table, "NULL")
+        rows = conn.execute(
+            f"""
+            SELECT {month}, 'INSERT INTO "{table}" VALUES(' || {values} || ');'
+            FROM "{table}"
+            ORDER BY 1, {", ".join(primary_key or ["rowid"])}
+            """  # noqa: S608
+        )
+        for month_, statement in rows:
+            path = f"{table}/{month_ or 'none'}.sql" if table in DUMP_SHARDS else f"{table}.sql"
+            shards[path].append(statement)
+    return {path: "".join(f"{line}\n" for line in lines) for path, lines in shards.items()}
+
+
+def read_dump_shards(path: Path) -> dict[str, str]:
+    return {file.relative_to(path).as_posix(): file.read_text() for file in path.rglob("*.sql")}
+
+
+def dump_db_to_shards(path: Path) -> None:
+    """Write a sharded dump of the DB to the directory at `path`.
 
-    engine: Engine = create_engine(f"sqlite:///{db_path}")
+    Only the files whose text changed are written, and the files of tables
+    or months that no longer have rows are removed.
 
+    """
+    engine: Engine = get_db_engine()
     with engine.connect() as conn:
-        with db_dump_path.open("r") as f:
-            sql: str = f.read()
-        statements = sql.split(";\n")
-        for statement in statements:
-            conn.execute(text(statement))
-        conn.commit()
+        shards = get_dump_shards(cast(sqlite3.Connection, conn.connection))
+    existing = read_dump_shards(path) if path.exists() else {}
+    changed = [name for name, text in shards.items() if existing.get(name) != text]
+    for name in changed:
+        file = path.joinpath(name)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(shards[name])
+    for name in existing.keys() - shards.keys():
+        file = path.joinpath(name)
+        file.unlink()
+        if file.parent != path and not any(file.parent.iterdir()):
+            file.parent.rmdir()
+    # NOTE: The dump is newer than the DB, even if no file had to be written
+    os.utime(path)
+    removed = len(existing.keys() - shards.keys())
+    print(f"Dumped database to {path} ({len(changed)} files written, {removed} removed)")
+
+
+def load_db_from_shards(db_path: Path, db_dump_path: Path) -> None:
+    print(f"Loading DB from {db_dump_path}")
+
+    schema = list(iter_dump_statements(db_dump_path.joinpath(DUMP_SCHEMA_FILE)))
+    # NOTE: The indexes and triggers are created after inserting the rows,
+    # like in the single file dump, so that the triggers don't update the
+    # tables that they maintain, which are restored from the dump.
+    tables = [statement for statement in schema if statement.startswith("CREATE TABLE")]
+    others = [statement for statement in schema if not statement.startswith("CREATE TABLE")]
+    files = sorted(set(db_dump_path.rglob("*.sql")) - {db_dump_path.joinpath(DUMP_SCHEMA_FILE)})
+    rows = (statement for file in files for statement in iter_dump_statements(file))
+    restore_db(db_path, chain(tables, rows, others))
+
+
+def get_db_dump_path(repo_path: Path, dump_format: str = DB_DUMP_FORMAT) -> Path:
+    try:
+        return repo_path.joinpath(DB_DUMP_NAMES[dump_format])
+    except KeyError:
+        raise ValueError(
+            f"Unknown db_dump_format {dump_format!r}, "
+            f"expected one of: {', '.join(DB_DUMP_NAMES)}"
+        ) from None
+
+
+def get_db_dump_last_modified(path: Path) -> float:
+    """Last modified time of a DB dump, or of any file in a sharded dump."""
+    if not path.exists():
+        return 0
+    paths = [path, *path.rglob("*")] if path.is_dir() else [path]
+    return max(path.stat().st_mtime for path in paths)
+
+
+def dump_db(path: Path, dump_format: str = DB_DUMP_FORMAT) -> None:
+    if dump_format == "sharded":
+        dump_db_to_shards(path)
+    else:
+        dump_db_to_csv(path)
+
+
+def load_db(db_path: Path, db_dump_path: Path) -> None:
+    """Restore the DB from a dump, and replay the journal of edits since the dump."""
+    if db_dump_path.is_dir():
+        load_db_from_shards(db_path, db_dump_path)
+    else:
+        load_db_from_csv(db_path, db_dump_path)
+
+    journal_path = get_db_journal_path(db_dump_path)
+    try:
+        replayed = replay_db_journal(db_path, journal_path)
+    except BaseException:
+        # NOTE: The DB without the edits would look newer than the dump
+        db_path.unlink(missing_ok=True)
+        raise
+    if replayed:
+        print(f"Replayed {replayed} edits from {journal_path}")
+
+
+def is_db_dump_changed(db_dump_path: Path) -> bool:
+    """Check if the dump differs from a dump of the DB, in the same format."""
+    if db_dump_path.is_dir():
+        with get_db_engine().connect() as conn:
+            shards = get_dump_shards(cast(sqlite3.Connection, conn.connection))
+        return read_dump_shards(db_dump_path) != shards
+
+    with tempfile.NamedTemporaryFile() as f:
+        dump_db_to_csv(Path(f.name))
+        temp_dump_text: str = Path(f.name).read_text()
+    return db_dump_path.read_text() != temp_dump_text
+
+
+def get_db_journal_path(db_dump_path: Path) -> Path:
+    return db_dump_path.with_name(DB_JOURNAL_NAME)
+
+
+def get_db_journal_entries(conn: sqlite3.Connection, last_seq: int) -> list[dict[str, Any]]:
+    """The edits recorded by the journal triggers, up to the one with seq `last_seq`.
+
+    Each entry has the table, id and column of the edit, with its old and new
+    values, or no column for inserted and deleted rows. The new values of an
+    inserted expense are read from the expense table, and are null if it has
+    since been deleted.
+
+    """
+    row = ", ".join(f"'{column.name}', e.{column.name}" for column in Expense.__table__.columns)
+    rows = conn.execute(
+        f"""
+        SELECT j.seq, j.timestamp, j.table_name, j.row_id, j.column_name, j.old_value,
+            CASE WHEN j.table_name = 'expense' AND j.column_name IS NULL AND j.old_value IS NULL
+                THEN (SELECT json_object({row}) FROM expense e WHERE e.id = j.row_id)
+                ELSE j.new_value
+            END
+        FROM db_journal j
+        WHERE j.seq <= ?
+        ORDER BY j.seq
+        """,  # noqa: S608
+        (last_seq,),
+    ).fetchall()
+    entries = [
+        {
+            "timestamp": timestamp,
+            "table": table,
+            "id": id_,
+            "column": column,
+            "old": json.loads(old) if old is not None else None,
+            "new": json.loads(new) if new is not None else None,
+        }
+        for _, timestamp, table, id_, column, old, new in rows
+    ]
+    return entries
+
+
+def write_db_journal(db_dump_path: Path, max_entries: int = DB_JOURNAL_MAX_ENTRIES) -> bool:
+    """Append the edits recorded in the DB to the journal next to the dump.
+
+    Returns False, without writing anything, if the journal would have more
+    than `max_entries` entries.
+
+    """
+    journal_path = get_db_journal_path(db_dump_path)
+    with get_db_engine().begin() as conn:
+        # NOTE: The entries are counted before loading them, since there could
+        # be any number of them, e.g., after a bulk edit.
+        count, last_seq = conn.execute(text("SELECT count(*), max(seq) FROM db_journal")).one()
+        if not count:
+            return True
+        with journal_path.open("a+") as f:
+            f.seek(0)
+            if sum(1 for _ in f) + count > max_entries:
+                return False
+            entries = get_db_journal_entries(cast(sqlite3.Connection, conn.connection), last_seq)
+            f.writelines(f"{json.dumps(entry)}\n" for entry in entries)
+        conn.execute(text("DELETE FROM db_journal WHERE seq <= :seq"), {"seq": last_seq})
+    print(f"Appended {len(entries)} edits to {journal_path}")
+    return True
+
+
+def apply_db_journal_entry(
+    cursor: sqlite3.Cursor, entry: dict[str, Any], expense_columns: set[str]
+) -> None:
+    id_, column, old, new = entry["id"], entry["column"], entry["old"], entry["new"]
+    if entry["table"] == "expense_tag":
+        if old is not None:
+            cursor.execute(
+                "DELETE FROM expense_tag WHERE expense_id = ? AND tag_id = ?", (id_, old)
+            )
+        if new is not None:
+            cursor.execute(
+                "INSERT OR IGNORE INTO expense_tag (expense_id, tag_id) VALUES (?, ?)", (id_, new)
+            )
+        return
+
+    # NOTE: The names of the columns are checked, since they are put in the SQL
+    names = {column} if column is not None else set(new or {})
+    if entry["table"] != "expense" or not names <= expense_columns:
+        raise ValueError(f"Invalid entry in the DB journal: {entry}")
+    if column is not None:
+        cursor.execute(f'UPDATE expense SET "{column}" = ? WHERE id = ?', (new, id_))  # noqa: S608
+    elif new is not None:
+        # NOTE: Replaying an insert again (e.g., when a sync was interrupted
+        # after rewriting the dump) leaves the row as it is.
+        columns = ", ".join(f'"{name}"' for name in new)
+        cursor.execute(
+            f"INSERT OR IGNORE INTO expense ({columns}) VALUES ({', '.join('?' * len(new))})",  # noqa: S608
+            list(new.values()),
+        )
+    else:
+        cursor.execute("DELETE FROM expense WHERE id = ?", (id_,))
+
+
+def replay_db_journal(db_path: Path, journal_path: Path) -> int:
+    """Apply the edits in the journal to a DB restored from the dump, in one transaction.
+
+    The triggers on the expense table update the tables derived from it, as
+    they did when the edits were made, and the journal entries they record
+    for the replayed edits are removed. Returns the number of edits replayed.
+
+    """
+    if not journal_path.exists():
+        return 0
+
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        expense_columns = {row[1] for row in connection.execute("PRAGMA table_info(expense)")}
+        cursor = connection.cursor()
+        cursor.execute("BEGIN")
+        replayed = 0
+        with journal_path.open() as f:
+            for line in f:
+                if line.strip():
+                    apply_db_journal_entry(cursor, json.loads(line), expense_columns)
+                    replayed += 1
+        cursor.execute("DELETE FROM db_journal")
+        cursor.execute("COMMIT")
+    finally:
+        connection.close()
+    return replayed
+
+
+def clear_db_journal() -> None:
+    """Remove the edits recorded for the journal, before dumping the whole DB."""
+    with get_db_engine().begin() as conn:
+        conn.execute(text("DELETE FROM db_journal"))
+
+
+def compact_db_journal(db_dump_path: Path) -> None:
+    """Rewrite the dump with the whole DB, and remove the journal of edits since the last dump."""
+    # NOTE: The dump includes the edits that haven't been written to the journal
+    clear_db_journal()
+    dump_db(db_dump_path)
+    get_db_journal_path(db_dump_path).unlink(missing_ok=True)
+
+
+def has_db_journal_triggers() -> bool:
+    """Whether the journal triggers of the DB are the ones defined by the model."""
+    with get_db_engine().connect() as conn:
+        rows = conn.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"))
+        triggers = {name: sql for name, sql in rows if name.startswith("db_journal_")}
+    return triggers == DB_JOURNAL_TRIGGERS
+
+
+def get_unjournaled_digest() -> str:
+    """SHA1 hex digest of the schema, and the rows of the tables whose changes aren't journaled."""
+    digest = sha1()  # noqa: S324
+    skipped = DB_JOURNALED_TABLES | DB_JOURNAL_DERIVED_TABLES
+    with get_db_engine().connect() as conn:
+        sqlite_conn = cast(sqlite3.Connection, conn.connection)
+        schema = sqlite_conn.execute(
+            """
+            SELECT type, name, sql FROM sqlite_master
+            WHERE sql NOT NULL AND name NOT LIKE 'sqlite_%'
+            ORDER BY name
+            """
+        ).fetchall()
+        for type_, name, sql in schema:
+            digest.update(f"{sql}\0".encode())
+            if type_ != "table" or name in skipped:
+                continue
+            for row in sqlite_conn.execute(f'SELECT * FROM "{name}" ORDER BY rowid'):  # noqa: S608
+                digest.update(f"{name}\0{row!r}\n".encode())
+    return digest.hexdigest()
+
+
+class DBSyncState(NamedTuple):
+    db_mtime: float
+    dump_mtime: float
+    dump_digest: str
+    journal_mtime: float
+    journal_digest: str
+    unjournaled_digest: str
+
+
+def get_db_dump_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA1 hex digest of the contents of a DB dump, or of all its shards."""
+    digest = sha1()  # noqa: S324
+    files = sorted(path.rglob("*.sql")) if path.is_dir() else [path]
+    for file in files:
+        if path.is_dir():
+            digest.update(f"{file.relative_to(path).as_posix()}\0".encode())
+        with file.open("rb") as f:
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_db_sync_state() -> DBSyncState | None:
+    try:
+        return DBSyncState(**json.loads(DB_SYNC_STATE_PATH.read_text()))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def get_db_journal_digest(journal_path: Path) -> str:
+    return get_db_dump_digest(journal_path) if journal_path.exists() else ""
+
+
+def save_db_sync_state(db_dump_path: Path, dump_digest: str | None = None) -> None:
+    # NOTE: Setting the PRAGMAs of a new DB (e.g., the journal mode) modifies
+    # it, so connect to it before getting its modified time.
+    unjournaled_digest = get_unjournaled_digest()
+    journal_path = get_db_journal_path(db_dump_path)
+    state = DBSyncState(
+        db_mtime=get_db_last_modified(),
+        dump_mtime=get_db_dump_last_modified(db_dump_path),
+        dump_digest=dump_digest or get_db_dump_digest(db_dump_path),
+        journal_mtime=get_db_dump_last_modified(journal_path),
+        journal_digest=get_db_journal_digest(journal_path),
+        unjournaled_digest=unjournaled_digest,
+    )
+    DB_SYNC_STATE_PATH.write_text(json.dumps(state._asdict()))
 
 
 def sync_db_with_data_repo() -> None:
+    """Sync the DB with the dump in the data repo, whichever has changed.
+
+    The modified times of the DB, the dump and its journal, and digests of
+    the dump and the journal, are saved after each sync. So, checking if the
+    DB or the dump has changed since costs a `stat` of each, and hashing the
+    dump only if it has been touched. Without a saved state, a dump of the DB
+    is compared with the dump in the data repo.
+
+    The edits of the DB since the last sync are appended to the journal, when
+    the dump hasn't changed since, and they are all journaled by up-to-date
+    triggers. Otherwise, the whole DB is dumped again, and the journal is
+    removed.
+
+    """
     db_path: Path = Path(DB_PATH)
     repo_path: Path = DATA_REPO_PATH
-    db_dump: Path = repo_path.joinpath("db.csv")
-
-    if not db_path.exists() and not db_dump.exists():
-        raise RuntimeError("Panic! No DB or DB dump found!")
+    db_dump: Path = get_db_dump_path(repo_path)
+    journal: Path = get_db_journal_path(db_dump)
 
     if not db_path.exists():
-        load_db_from_csv(db_path, db_dump)
+        # NOTE: A dump in the other format is used to create the DB, when
+        # switching formats. The DB is then dumped in the configured format.
+        dumps = [db_dump, *(get_db_dump_path(repo_path, name) for name in DB_DUMP_NAMES)]
+        existing = [dump for dump in dumps if dump.exists()]
+        if not existing:
+            raise RuntimeError("Panic! No DB or DB dump found!")
+        load_db(db_path, existing[0])
+        if existing[0] != db_dump:
+            compact_db_journal(db_dump)
+        save_db_sync_state(db_dump)
         return
 
-    db_last_modified: float = db_path.stat().st_mtime
-    dump_last_modified: float = db_dump.stat().st_mtime if db_dump.exists() else 0
-
-    if db_last_modified > dump_last_modified:
-        print("Database is newer than database dump")
-        dump_db_to_csv(db_dump)
+    db_last_modified: float = get_db_last_modified()
+    dump_mtime: float = get_db_dump_last_modified(db_dump)
+    journal_mtime: float = get_db_dump_last_modified(journal)
+    dump_last_modified: float = max(dump_mtime, journal_mtime)
+    state = load_db_sync_state()
+    dump_digest = None
 
-    elif dump_last_modified > db_last_modified:
-        print("Database dump is newer than database")
+    if state is None:
+        db_changed = db_last_modified > dump_last_modified
+        # NOTE: A dump with a journal differs from a dump of the DB
+        dump_changed = dump_last_modified > db_last_modified and is_db_dump_changed(db_dump)
+        dump_modified = True
+    else:
+        db_changed = db_last_modified != state.db_mtime or not db_dump.exists()
+        dump_changed = False
+        if db_dump.exists() and dump_mtime != state.dump_mtime:
+            dump_digest = get_db_dump_digest(db_dump)
+            dump_changed = dump_digest != state.dump_digest
+        if journal_mtime != state.journal_mtime:
+            dump_changed |= get_db_journal_digest(journal) != state.journal_digest
+        dump_modified = dump_changed
+        if db_changed and dump_changed:
+            # NOTE: Both changed since the last sync, and the newer one wins
+            db_changed = db_last_modified > dump_last_modified
+            dump_changed = not db_changed
 
-        with tempfile.NamedTemporaryFile() as f:
-            dump_db_to_csv(Path(f.name))
-            temp_dump_text: str = Path(f.name).read_text()
+    if db_changed:
+        print("Database is newer than database dump")
+        journaled = has_db_journal_triggers()
+        if not journaled:
+            print("The journal triggers are outdated, run `alembic upgrade head`")
+        if (
+            state is not None
+            and not dump_modified
+            and db_dump.exists()
+            and journaled
+            and state.unjournaled_digest == get_unjournaled_digest()
+            and write_db_journal(db_dump)
+        ):
+            dump_digest = state.dump_digest
+        else:
+            compact_db_journal(db_dump)
+            dump_digest = None
 
-        if db_dump.read_text() != temp_dump_text:
-            print("Database dump has changed since last update")
+    elif dump_changed:
+        print("Database dump has changed since last update")
 
-            temp_db_path: Path = Path(tempfile.mkstemp(suffix=".sqlite")[1])
-            load_db_from_csv(temp_db_path, db_dump)
-            Path(DB_PATH).rename(DB_PATH.with_suffix(".bak"))
-            temp_db_path.rename(DB_PATH)
-            print(f"Replaced {DB_PATH} with the updated database")
+        temp_db_path: Path = Path(tempfile.mkstemp(suffix=".sqlite")[1])
+        load_db(temp_db_path, db_dump)
+        # NOTE: Closing the connections checkpoints the WAL into the DB
+        reset_db_engines()
+        Path(DB_PATH).rename(DB_PATH.with_suffix(".bak"))
+        temp_db_path.rename(DB_PATH)
+        reset_db_engines()
+        print(f"Replaced {DB_PATH} with the updated database")
 
-        else:
-            print("Database dump has not changed since last update")
-            db_dump.touch()
-            Path(DB_PATH).touch()
+    elif state is not None and (db_last_modified, dump_mtime, journal_mtime) == (
+        state.db_mtime,
+        state.dump_mtime,
+        state.journal_mtime,
+    ):
+        print("The Database and the database dump are in sync")
+        return
 
     else:
-        print("The Database and the database dump are in sync")
+        print("Database dump has not changed since last update")
+
+    save_db_sync_state(db_dump, dump_digest)
@@ -0,0 +1,196 @@
+"""Generate synthetic bank statements, for benchmarks and manual testing.
+
+The statements use the column layouts and date formats in the `Source`
+classes, and the details formats understood by their `parse_details`.
+
+"""
+
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.data import CATEGORIES
+from app.scrapers import AxisCCStatement, AxisStatement, CashStatement, SBIStatement
+from app.scrapers.base import Source
+
+NAMES = [
+    "RAVI KUMAR",
+    "SHARADHA",
+    "Syed Khad",
+    "BharatPe",
+    "PayU Paym",
+    "RANJAN K",
+    "Rajathadr",
+    "MEENA S",
+    "ANIL REDDY",
+    "Zomato",
+]
+BANKS = ["Axis Bank", "HDFC Bank", "Yes Bank", "Kotak Mah", "Federal B", "Paytm Pay", "ICICI Bank"]
+MERCHANTS = [
+    "SWIGGY",
+    "ZOMATO",
+    "AMAZON",
+    "FLIPKART",
+    "APOLLO PHARMACY",
+    "BESCOM BILLDESK",
+    "UBERINDIASYSTEMSPRIVAT",
+    "DELHI METRO RAIL CORPO",
+    "COMMISSIONER BBMP",
+    "GITHUB, INC.",
+]
+CITIES = ["BANGALORE", "NEW DELHI", "MUMBAI", "CHENNAI", "NOIDA", "Bengaluru"]
+REMARKS = ["UPI", "Eating Out", "Groceries", "Rent", "Software", "Travel", "Gift"]
+
+# Details formats understood by AxisStatement.parse_details, with weights
+# roughly matching a real account statement.
+AXIS_DETAILS: list[tuple[str, float]] = [
+    ("UPI/P2M/{txn}/{name}/{bank}/{remarks}", 0.55),
+    ("UPI/P2A/{txn}/{name}/{bank}/{remarks}", 0.15),
+    ("IMPS/P2A/{txn}/{NAME}/XXXXXXX{n}/{bank}/{remarks}", 0.04),
+    ("NEFT/MB/AXMB{txn}/{NAME}/{BANK}/{remarks}", 0.04),
+    ("NBSM/{txn}/{NAME}/{remarks}", 0.02),
+    ("ECOM PUR/{merchant}/{date}", 0.05),
+    ("POS/{merchant} {city}/{txn}/{date}", 0.05),
+    ("ATM-CASH/{city}/{n}", 0.02),
+    ("BRN-CLG-CHQ PAID TO {NAME}", 0.01),
+    ("Consolidated Charges for A/c", 0.02),
+    ("GST @18% on Charge", 0.02),
+    ("CreditCard Payment XXXX {n} #{txn}", 0.02),
+    ("TIPS/SCG/{n}/{txn}/{merchant}/{remarks}", 0.005),
+    ("UPI/CRADJ/{txn}/{remarks}", 0.005),
+]
+
+
+def _choice(rng: np.random.Generator, values: list[str], n: int) -> list[str]:
+    return [values[i] for i in rng.integers(0, len(values), n)]
+
+
+def _dates(rng: np.random.Generator, n: int, start: str, days: int) -> pd.Series:
+    """Random dates (with times) in the `days` after `start`, in sorted order."""
+    seconds = np.sort(rng.integers(0, days * 24 * 3600, n))
+    return pd.Series(pd.Timestamp(start) + pd.to_timedelta(seconds, unit="s"))
+
+
+def _amounts(rng: np.random.Generator, n: int) -> np.ndarray:
+    # Mostly small payments, with a long tail of larger ones
+    return np.round(np.minimum(rng.lognormal(5.5, 1.2, n), 200_000), 2)
+
+
+def _axis_details(rng: np.random.Generator, n: int) -> list[str]:
+    templates, weights = zip(*AXIS_DETAILS, strict=True)
+    p = np.array(weights) / sum(weights)
+    kinds = rng.choice(len(templates), size=n, p=p)
+    names = _choice(rng, NAMES, n)
+    banks = _choice(rng, BANKS, n)
+    merchants = _choice(rng, MERCHANTS, n)
+    cities = _choice(rng, CITIES, n)
+    remarks = _choice(rng, REMARKS, n)
+    txns = rng.integers(100_000_000, 999_999_999, n)
+    nums = rng.integers(1000, 9999, n)
+    return [
+        templates[kind].format(
+            txn=txns[i],
+            n=nums[i],
+            name=names[i],
+            NAME=names[i].upper(),
+            bank=banks[i],
+            BANK=banks[i].upper(),
+            merchant=merchants[i].split(",")[0],
+            city=cities[i],
+            remarks=remarks[i],
+            date="12-03-2023",
+        )
+        for i, kind in enumerate(kinds)
+    ]
+
+
+def axis_statement(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    dates = _dates(rng, n, "2018-01-01", 5 * 365)
+    amounts = _amounts(rng, n)
+    credit = rng.random(n) < 0.1  # noqa: PLR2004
+    balance = 50_000 + np.cumsum(np.where(credit, amounts, -amounts))
+    return pd.DataFrame(
+        {
+            "Tran Date": dates.dt.strftime(AxisStatement.date_format),
+            "CHQNO": "-",
+            "PARTICULARS": _axis_details(rng, n),
+            # NOTE: Axis pads the amounts with spaces, and uses " " for empty values
+            "DR": [" " if c else f"{a:21.2f}" for a, c in zip(amounts, credit, strict=True)],
+            "CR": [f"{a:21.2f}" if c else " " for a, c in zip(amounts, credit, strict=True)],
+            "BAL": [f"{b:21.2f}" for b in balance],
+            "SOL": 3567,
+        }
+    )
+
+
+def axis_cc_statement(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    dates = _dates(rng, n, "2021-01-01", 3 * 365)
+    amounts = _amounts(rng, n)
+    payment = rng.random(n) < 0.03  # noqa: PLR2004
+    merchants = _choice(rng, MERCHANTS, n)
+    cities = _choice(rng, CITIES, n)
+    details = [
+        "MB PAYMENT #AXMB" if p else f"{m}, {c}, IN"
+        for m, c, p in zip(merchants, cities, payment, strict=True)
+    ]
+    return pd.DataFrame(
+        {
+            "Date": dates.dt.strftime(AxisCCStatement.date_format),
+            "Transaction Details": details,
+            "Debit": [None if p else f"{a:,.2f}" for a, p in zip(amounts, payment, strict=True)],
+            "Credit": [f"{a:,.2f}" if p else None for a, p in zip(amounts, payment, strict=True)],
+        }
+    )
+
+
+def sbi_statement(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    dates = _dates(rng, n, "2018-01-01", 5 * 365).dt.strftime(SBIStatement.date_format)
+    amounts = _amounts(rng, n)
+    credit = rng.random(n) < 0.1  # noqa: PLR2004
+    names = _choice(rng, NAMES, n)
+    txns = rng.integers(100_000_000, 999_999_999, n)
+    kind = np.where(credit, "CR", "DR")
+    return pd.DataFrame(
+        {
+            "Txn Date": dates,
+            "Value Date": dates,
+            "Description": [
+                f"TO TRANSFER-UPI/{k}/{t}/{name}/SBIN/upi--"
+                for k, t, name in zip(kind, txns, names, strict=True)
+            ],
+            "Ref No./Cheque No.": [f"TRANSFER TO {t}" for t in txns],
+            "Debit": np.where(credit, np.nan, amounts),
+            "Credit": np.where(credit, amounts, np.nan),
+            "Balance": 50_000 + np.cumsum(np.where(credit, amounts, -amounts)),
+        }
+    )
+
+
+def cash_statement(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    dates = _dates(rng, n, "2022-01-01", 2 * 365)
+    return pd.DataFrame(
+        {
+            "Timestamp": dates.dt.strftime(CashStatement.date_format),
+            "Amount": np.round(rng.integers(10, 2000, n), -1),
+            "Details": _choice(rng, MERCHANTS, n),
+            "Category": _choice(rng, CATEGORIES, n),
+        }
+    )
+
+
+STATEMENTS: dict[str, Callable[[int, np.random.Generator], pd.DataFrame]] = {
+    AxisStatement.name: axis_statement,
+    AxisCCStatement.name: axis_cc_statement,
+    SBIStatement.name: sbi_statement,
+    CashStatement.name: cash_statement,
+}
+
+
+def write_statement(source_cls: type[Source], path: Path, n: int, seed: int = 0) -> Path:
+    """Write a synthetic statement with `n` rows for `source_cls` to `path`."""
+    rng = np.random.default_rng(seed)
+    data = STATEMENTS[source_cls.name](n, rng)
+    data.to_csv(path, index=False)
+    return path
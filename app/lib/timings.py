@@ -0,0 +1,79 @@
+"""Record wall time and rows processed for each stage of a pipeline."""
+
+import json
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass
+class Stage:
+    seconds: float = 0.0
+    rows: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+class Timings:
+    """Wall time and rows processed, accumulated for each named stage."""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, Stage] = {}
+
+    @contextmanager
+    def measure(self, name: str, rows: int = 0) -> Iterator[Stage]:
+        """Time the body of the `with` block as the stage `name`.
+
+        The number of rows can be passed upfront, or set on the yielded Stage
+        object when it is known only at the end of the stage.
+
+        """
+        stage = Stage(rows=rows)
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds = time.perf_counter() - start
+            self.add(name, stage)
+
+    def add(self, name: str, stage: Stage) -> None:
+        total = self.stages.setdefault(name, Stage())
+        total.seconds += stage.seconds
+        total.rows += stage.rows
+
+    def merge(self, other: "Timings") -> None:
+        for name, stage in other.stages.items():
+            self.add(name, stage)
+
+    def reset(self) -> None:
+        self.stages.clear()
+
+    def as_dict(self) -> dict[str, dict[str, float]]:
+        return {
+            name: {
+                "seconds": round(stage.seconds, 6),
+                "rows": stage.rows,
+                "rows_per_second": round(stage.rows_per_second, 1),
+            }
+            for name, stage in self.stages.items()
+        }
+
+    def format_table(self) -> str:
+        lines = [f"{'stage':<28} {'seconds':>10} {'rows':>10} {'rows/s':>12}"]
+        for name, stage in self.stages.items():
+            rate = f"{stage.rows_per_second:,.0f}" if stage.rows else "-"
+            lines.append(f"{name:<28} {stage.seconds:>10.3f} {stage.rows:>10} {rate:>12}")
+        return "\n".join(lines)
+
+    def write_json(self, path: Path) -> None:
+        with path.open("w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+            f.write("\n")
+
+
+# Timings recorded by the ingestion pipeline in the current process
+TIMINGS = Timings()
@@ -1,10 +1,19 @@
+from decimal import Decimal
+from typing import Any, cast
+
 import sqlalchemy as sa
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, declarative_base, relationship
 from sqlalchemy.sql.expression import literal
 
 Base = declarative_base()
 
 
+def to_paise(amount: Decimal | float) -> int:
+    """Convert an amount in rupees to an integer number of paise."""
+    return int(round(Decimal(str(amount)) * 100))
+
+
 class Category(Base):
     __tablename__ = "category"
     id = sa.Column(sa.Integer, primary_key=True)
@@ -28,7 +37,9 @@ class Expense(Base):
     id = sa.Column(sa.String(40), primary_key=True)
     date = sa.Column(sa.DateTime(), nullable=False)
     details = sa.Column(sa.Text(), nullable=False)
-    amount = sa.Column(sa.Float(asdecimal=True, decimal_return_scale=2), nullable=False)
+    # NOTE: Amounts are stored in paise (1/100th of a rupee), so that sums are
+    # exact. Use the `amount` property to get or set the amount in rupees.
+    amount_paise = sa.Column(sa.BigInteger, nullable=False)
     ignore = sa.Column(sa.Boolean(), nullable=False, default=False, server_default=literal(False))
     category_id = sa.Column(sa.Integer, sa.ForeignKey("category.id"))
     category: Mapped[Category | None] = relationship("Category", backref="expenses")
@@ -49,6 +60,36 @@ class Expense(Base):
     parent = sa.Column(sa.String(40), sa.ForeignKey("expense.id"))
     reviewed = sa.Column(sa.Boolean(), nullable=False, default=False, server_default=literal(False))
 
+    __table_args__ = (
+        # Date range of the dashboard, with its filter on parent
+        sa.Index("ix_expense_date_parent", "date", "parent"),
+        # Children of expenses. NOTE: Most expenses have no parent, and the
+        # NULLs would make the index look useless to the query planner.
+        sa.Index("ix_expense_parent", "parent", sqlite_where=sa.text("parent IS NOT NULL")),
+        # Expenses with the same counterparty, when editing the category
+        sa.Index("ix_expense_counterparty_name", "counterparty_name"),
+        # Expenses with the same parsed counterparty, when editing the name
+        sa.Index(
+            "ix_expense_counterparty_name_p",
+            "counterparty_name_p",
+            "counterparty_name",
+            "source",
+        ),
+    )
+
+    @hybrid_property
+    def amount(self) -> Decimal:
+        return Decimal(cast(int, self.amount_paise)).scaleb(-2)
+
+    @amount.inplace.setter
+    def _amount_setter(self, value: Decimal | float) -> None:
+        self.amount_paise = to_paise(value)
+
+    @amount.inplace.expression
+    @classmethod
+    def _amount_expression(cls) -> Any:
+        return cls.amount_paise / 100.0
+
     def __repr__(self) -> str:
         return (
             f"Expense(id={self.id!r}, date={self.date!r}, amount={self.amount!r}, "
@@ -59,12 +100,66 @@ class Expense(Base):
         )
 
 
-class NewID(Base):
-    __tablename__ = "new_id"
-    id = sa.Column(sa.String(40), primary_key=True)
+class IngestedFile(Base):
+    __tablename__ = "ingested_file"
+    path = sa.Column(sa.String(200), primary_key=True)
+    size = sa.Column(sa.Integer, nullable=False)
+    mtime_ns = sa.Column(sa.BigInteger, nullable=False)
+    sha1 = sa.Column(sa.String(40), nullable=False)
+    rows = sa.Column(sa.Integer, nullable=False, default=0, server_default=literal(0))
+    ingested_at = sa.Column(sa.DateTime(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"IngestedFile(path={self.path!r}, size={self.size!r}, sha1={self.sha1!r})"
+
+
+class CounterpartyAlias(Base):
+    """Number of expenses with each name given to a parsed counterparty name.
+
+    The table is kept up to date by triggers on the expense table, for every
+    expense whose counterparty name differs from the parsed name.
+
+    """
+
+    __tablename__ = "counterparty_alias"
+    source = sa.Column(sa.String(10), primary_key=True)
+    counterparty_name_p = sa.Column(sa.String(100), primary_key=True)
+    counterparty_name = sa.Column(sa.String(100), primary_key=True)
+    count = sa.Column(sa.Integer, nullable=False, default=0, server_default=literal(0))
+
+    def __repr__(self) -> str:
+        return (
+            f"CounterpartyAlias(source={self.source!r}, "
+            f"counterparty_name_p={self.counterparty_name_p!r}, "
+            f"counterparty_name={self.counterparty_name!r}, count={self.count!r})"
+        )
+
+
+class MonthlySummary(Base):
+    """Total, number and maximum of the amounts of expenses in each month.
+
+    Children of an expense are summarized with their parent, under its month
+    and category, like the dashboard shows them. Uncategorized expenses are
+    summarized under category 0. The table is kept up to date by triggers on
+    the expense table.
+
+    """
+
+    __tablename__ = "monthly_summary"
+    year = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    month = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    category_id = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    ignore = sa.Column(sa.Boolean(), primary_key=True)
+    amount_paise = sa.Column(sa.BigInteger, nullable=False, default=0, server_default=literal(0))
+    count = sa.Column(sa.Integer, nullable=False, default=0, server_default=literal(0))
+    max_amount_paise = sa.Column(sa.BigInteger, nullable=True)
 
     def __repr__(self) -> str:
-        return f"NewID(id={self.id!r})"
+        return (
+            f"MonthlySummary(year={self.year!r}, month={self.month!r}, "
+            f"category_id={self.category_id!r}, ignore={self.ignore!r}, "
+            f"amount_paise={self.amount_paise!r}, count={self.count!r})"
+        )
 
 
 expense_tag_table = sa.Table(
@@ -73,3 +168,260 @@ expense_tag_table = sa.Table(
     sa.Column("expense_id", sa.ForeignKey("expense.id"), primary_key=True),
     sa.Column("tag_id", sa.ForeignKey("tag.id"), primary_key=True),
 )
+
+
+# NOTE: The same conditions as the old lookup that scanned the whole expense
+# table: the parsed name is not empty, and the name differs from it.
+_ALIAS_KEY = """
+    source = {row}.source
+    AND counterparty_name_p = {row}.counterparty_name_p
+    AND counterparty_name = coalesce({row}.counterparty_name, '')
+"""
+_IS_ALIASED = (
+    "{row}.counterparty_name_p != '' AND {row}.counterparty_name IS NOT {row}.counterparty_name_p"
+)
+_ADD_ALIAS = f"""
+    INSERT INTO counterparty_alias (source, counterparty_name_p, counterparty_name, count)
+    SELECT {{row}}.source, {{row}}.counterparty_name_p, coalesce({{row}}.counterparty_name, ''), 1
+    WHERE {_IS_ALIASED}
+    ON CONFLICT (source, counterparty_name_p, counterparty_name) DO UPDATE SET count = count + 1;
+"""
+_REMOVE_ALIAS = f"""
+    UPDATE counterparty_alias SET count = count - 1 WHERE {_IS_ALIASED} AND {_ALIAS_KEY};
+    DELETE FROM counterparty_alias WHERE count <= 0 AND {_ALIAS_KEY};
+"""  # noqa: S608
+
+_TRIGGERS = {
+    "counterparty_alias_insert": f"""
+        CREATE TRIGGER counterparty_alias_insert AFTER INSERT ON expense
+        BEGIN {_ADD_ALIAS.format(row="NEW")} END
+    """,
+    "counterparty_alias_update": f"""
+        CREATE TRIGGER counterparty_alias_update
+        AFTER UPDATE OF source, counterparty_name, counterparty_name_p ON expense
+        WHEN OLD.source IS NOT NEW.source
+            OR OLD.counterparty_name IS NOT NEW.counterparty_name
+            OR OLD.counterparty_name_p IS NOT NEW.counterparty_name_p
+        BEGIN {_REMOVE_ALIAS.format(row="OLD")} {_ADD_ALIAS.format(row="NEW")} END
+    """,
+    "counterparty_alias_delete": f"""
+        CREATE TRIGGER counterparty_alias_delete AFTER DELETE ON expense
+        BEGIN {_REMOVE_ALIAS.format(row="OLD")} END
+    """,
+}
+# NOTE: The SQL of each trigger is collapsed to a single line, because the DB
+# dumps are restored by splitting them into statements at ";\n".
+COUNTERPARTY_ALIAS_TRIGGERS = {name: " ".join(sql.split()) for name, sql in _TRIGGERS.items()}
+
+for _trigger in COUNTERPARTY_ALIAS_TRIGGERS.values():
+    sa.event.listen(Base.metadata, "after_create", sa.DDL(_trigger))
+
+
+# NOTE: The triggers below can't use "%" (e.g., in strftime), since the DDL
+# statements are formatted with it. The year and month are sliced from the
+# dates instead, which are stored as "YYYY-MM-DD HH:MM:SS" strings.
+
+# The row itself, with the date and category of the expense it is summarized
+# under: its own, or its parent's when it is a child of a top-level expense.
+# Other children, of missing or nested parents, get no date.
+_SUMMARY_ROW = """
+    SELECT
+        CASE WHEN coalesce({row}.parent, '') = '' THEN {row}.date ELSE p.date END AS date,
+        CASE WHEN coalesce({row}.parent, '') = '' THEN {row}.category_id ELSE p.category_id END
+            AS category_id,
+        {row}.ignore AS ignore,
+        {row}.amount_paise AS amount_paise
+    FROM (SELECT 1) LEFT JOIN expense p ON p.id = {row}.parent AND coalesce(p.parent, '') = ''
+"""
+# The children of the row, summarized under it if it is a top-level expense
+_SUMMARY_CHILDREN = """
+    SELECT {row}.date AS date, {row}.category_id AS category_id, c.ignore AS ignore,
+        c.amount_paise AS amount_paise
+    FROM expense c
+    WHERE c.parent = {row}.id AND coalesce({row}.parent, '') = ''
+"""
+_SUMMARY_GROUPS = """
+    SELECT
+        CAST(substr(date, 1, 4) AS INTEGER) AS year,
+        CAST(substr(date, 6, 2) AS INTEGER) AS month,
+        coalesce(category_id, 0) AS category_id,
+        ignore,
+        sum(amount_paise) AS amount_paise,
+        count(*) AS count,
+        max(amount_paise) AS max_amount_paise
+    FROM ({rows})
+    WHERE date IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+"""
+_ADD_SUMMARY = f"""
+    INSERT INTO monthly_summary
+        (year, month, category_id, ignore, amount_paise, count, max_amount_paise)
+    {_SUMMARY_GROUPS}
+    ON CONFLICT (year, month, category_id, ignore) DO UPDATE SET
+        amount_paise = amount_paise + excluded.amount_paise,
+        count = count + excluded.count,
+        max_amount_paise = max(max_amount_paise, excluded.max_amount_paise);
+"""
+# NOTE: The maximum can't be updated by a subtraction, so it is cleared when
+# the removed rows include it, and computed again from the month's rows.
+_REMOVE_SUMMARY = f"""
+    UPDATE monthly_summary SET
+        amount_paise = monthly_summary.amount_paise - s.amount_paise,
+        count = monthly_summary.count - s.count,
+        max_amount_paise = CASE
+            WHEN s.max_amount_paise < monthly_summary.max_amount_paise
+            THEN monthly_summary.max_amount_paise
+        END
+    FROM ({_SUMMARY_GROUPS}) AS s
+    WHERE monthly_summary.year = s.year
+        AND monthly_summary.month = s.month
+        AND monthly_summary.category_id = s.category_id
+        AND monthly_summary.ignore = s.ignore;
+"""
+# All the dates of a month are between "YYYY-MM" and "YYYY-MM-32"
+_SUMMARY_MONTH = "(monthly_summary.year || '-' || substr('0' || monthly_summary.month, -2))"
+_FIX_SUMMARY = f"""
+    DELETE FROM monthly_summary WHERE count <= 0;
+    UPDATE monthly_summary SET max_amount_paise = (
+        SELECT max(amount_paise) FROM (
+            SELECT e.amount_paise FROM expense e
+            WHERE e.date >= {_SUMMARY_MONTH} AND e.date < {_SUMMARY_MONTH} || '-32'
+                AND coalesce(e.parent, '') = ''
+                AND coalesce(e.category_id, 0) = monthly_summary.category_id
+                AND e.ignore = monthly_summary.ignore
+            UNION ALL
+            SELECT c.amount_paise FROM expense p JOIN expense c ON c.parent = p.id
+            WHERE p.date >= {_SUMMARY_MONTH} AND p.date < {_SUMMARY_MONTH} || '-32'
+                AND coalesce(p.parent, '') = ''
+                AND coalesce(p.category_id, 0) = monthly_summary.category_id
+                AND c.ignore = monthly_summary.ignore
+        )
+    )
+    WHERE max_amount_paise IS NULL;
+"""  # noqa: S608
+
+
+def _summary_rows(row: str, children: bool = True) -> str:
+    rows = [_SUMMARY_ROW, _SUMMARY_CHILDREN] if children else [_SUMMARY_ROW]
+    return " UNION ALL ".join(rows).format(row=row)
+
+
+_SUMMARY_TRIGGERS = {
+    "monthly_summary_insert": f"""
+        CREATE TRIGGER monthly_summary_insert AFTER INSERT ON expense
+        BEGIN {_ADD_SUMMARY.format(rows=_summary_rows("NEW"))} END
+    """,
+    "monthly_summary_update": f"""
+        CREATE TRIGGER monthly_summary_update
+        AFTER UPDATE OF date, category_id, ignore, amount_paise, parent ON expense
+        WHEN OLD.date IS NOT NEW.date
+            OR OLD.category_id IS NOT NEW.category_id
+            OR OLD.ignore IS NOT NEW.ignore
+            OR OLD.amount_paise IS NOT NEW.amount_paise
+            OR OLD.parent IS NOT NEW.parent
+        BEGIN
+            {_REMOVE_SUMMARY.format(rows=_summary_rows("OLD", children=False))}
+            {_ADD_SUMMARY.format(rows=_summary_rows("NEW", children=False))}
+            {_FIX_SUMMARY}
+        END
+    """,
+    # NOTE: The children move with their parent, when it moves to another
+    # month or category, or stops (or starts) being a top-level expense.
+    "monthly_summary_update_children": f"""
+        CREATE TRIGGER monthly_summary_update_children
+        AFTER UPDATE OF date, category_id, parent ON expense
+        WHEN OLD.date IS NOT NEW.date
+            OR OLD.category_id IS NOT NEW.category_id
+            OR OLD.parent IS NOT NEW.parent
+        BEGIN
+            {_REMOVE_SUMMARY.format(rows=_SUMMARY_CHILDREN.format(row="OLD"))}
+            {_ADD_SUMMARY.format(rows=_SUMMARY_CHILDREN.format(row="NEW"))}
+            {_FIX_SUMMARY}
+        END
+    """,
+    "monthly_summary_delete": f"""
+        CREATE TRIGGER monthly_summary_delete AFTER DELETE ON expense
+        BEGIN {_REMOVE_SUMMARY.format(rows=_summary_rows("OLD"))} {_FIX_SUMMARY} END
+    """,
+}
+MONTHLY_SUMMARY_TRIGGERS = {name: " ".join(sql.split()) for name, sql in _SUMMARY_TRIGGERS.items()}
+
+for _trigger in MONTHLY_SUMMARY_TRIGGERS.values():
+    sa.event.listen(Base.metadata, "after_create", sa.DDL(_trigger))
+
+
+class DBJournalEntry(Base):
+    """An edit of an expense (or its tags), not yet written to the journal in the data repo.
+
+    The entries are recorded by triggers on the expense and expense_tag
+    tables. Values are stored as JSON, so that their types are kept. Inserted
+    expenses are recorded by their id only, and their values are read when
+    the entries are written to the journal.
+
+    """
+
+    __tablename__ = "db_journal"
+    seq = sa.Column(sa.Integer, primary_key=True)
+    timestamp = sa.Column(sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp())
+    table_name = sa.Column(sa.String(20), nullable=False)
+    row_id = sa.Column(sa.String(40), nullable=False)
+    column_name = sa.Column(sa.String(40), nullable=True)
+    old_value = sa.Column(sa.Text(), nullable=True)
+    new_value = sa.Column(sa.Text(), nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"DBJournalEntry(seq={self.seq!r}, table_name={self.table_name!r}, "
+            f"row_id={self.row_id!r}, column_name={self.column_name!r}, "
+            f"old_value={self.old_value!r}, new_value={self.new_value!r})"
+        )
+
+
+# NOTE: The id is journaled last, since the other columns of a row are
+# recorded under its old id. The triggers have to be created again by a
+# migration, when columns are added to the expense table. Until then, the
+# dump is rewritten on every sync (see sync_db_with_data_repo).
+_JOURNAL_COLUMNS = [
+    *(column.name for column in Expense.__table__.columns if column.name != "id"),
+    "id",
+]
+_ADD_ENTRY = "INSERT INTO db_journal (table_name, row_id, column_name, old_value, new_value)"
+_JOURNAL_COLUMN = f"""
+    {_ADD_ENTRY}
+    SELECT 'expense', OLD.id, '{{column}}', json_quote(OLD.{{column}}), json_quote(NEW.{{column}})
+    WHERE OLD.{{column}} IS NOT NEW.{{column}};
+"""
+_OLD_ROW = ", ".join(f"'{column}', OLD.{column}" for column in _JOURNAL_COLUMNS)
+
+_JOURNAL_TRIGGERS = {
+    "db_journal_expense_insert": f"""
+        CREATE TRIGGER db_journal_expense_insert AFTER INSERT ON expense
+        BEGIN {_ADD_ENTRY} VALUES ('expense', NEW.id, NULL, NULL, NULL); END
+    """,  # noqa: S608
+    "db_journal_expense_update": f"""
+        CREATE TRIGGER db_journal_expense_update AFTER UPDATE ON expense
+        BEGIN {"".join(_JOURNAL_COLUMN.format(column=c) for c in _JOURNAL_COLUMNS)} END
+    """,
+    "db_journal_expense_delete": f"""
+        CREATE TRIGGER db_journal_expense_delete AFTER DELETE ON expense
+        BEGIN {_ADD_ENTRY} VALUES ('expense', OLD.id, NULL, json_object({_OLD_ROW}), NULL); END
+    """,
+    "db_journal_expense_tag_insert": f"""
+        CREATE TRIGGER db_journal_expense_tag_insert AFTER INSERT ON expense_tag
+        BEGIN
+            {_ADD_ENTRY}
+            VALUES ('expense_tag', NEW.expense_id, 'tag_id', NULL, json_quote(NEW.tag_id));
+        END
+    """,  # noqa: S608
+    "db_journal_expense_tag_delete": f"""
+        CREATE TRIGGER db_journal_expense_tag_delete AFTER DELETE ON expense_tag
+        BEGIN
+            {_ADD_ENTRY}
+            VALUES ('expense_tag', OLD.expense_id, 'tag_id', json_quote(OLD.tag_id), NULL);
+        END
+    """,
+}
+DB_JOURNAL_TRIGGERS = {name: " ".join(sql.split()) for name, sql in _JOURNAL_TRIGGERS.items()}
+
+for _trigger in DB_JOURNAL_TRIGGERS.values():
+    sa.event.listen(Base.metadata, "after_create", sa.DDL(_trigger))
@@ -16,8 +16,8 @@ from sqlalchemy.orm.session import Session
 # Local
 from app.components.git_status import check_git_status
 from app.db_util import (
-    DB_PATH,
     get_db_engine,
+    get_db_last_modified,
     set_tags_value,
     sync_db_with_data_repo,
     update_similar_counterparty_categories,
@@ -81,15 +81,19 @@ def load_data(
         if category_id not in {NO_CATEGORY, ALL_CATEGORY}
         else ("AND e.category_id IS NULL" if category_id == NO_CATEGORY else "")
     )
+    # NOTE: The tags are aggregated in a subquery, and the parent is checked
+    # with coalesce, so that SQLite searches the index on date instead of
+    # scanning the table in the order of the ids.
     base_sql = """
-    SELECT e.*, JSON_GROUP_ARRAY(et.tag_id) AS tags
+    SELECT e.*, (
+        SELECT JSON_GROUP_ARRAY(et.tag_id) FROM expense_tag et WHERE et.expense_id = e.id
+    ) AS tags
     FROM expense e
-    LEFT JOIN expense_tag et ON e.id = et.expense_id
     """
     filter_sql = f"""WHERE e.date >= :start_date AND e.date < :end_date
-    AND (e.parent IS NULL OR e.parent = '')
+    AND coalesce(e.parent, '') = ''
     {category_clause}
-    GROUP BY e.id;
+    ORDER BY e.id;
     """
     params = {"start_date": start_date, "end_date": end_date, "category": category_id}
     if category_id in {NO_CATEGORY, ALL_CATEGORY}:
@@ -99,12 +103,14 @@ def load_data(
     data = pd.read_sql_query(sql, engine, parse_dates=["date"], dtype=dtype)
     parents = tuple(set(data["id"]))
     if parents:
-        child_sql = text(f"{base_sql} WHERE e.parent IN :parents GROUP BY e.id").bindparams(
+        child_sql = text(f"{base_sql} WHERE e.parent IN :parents ORDER BY e.id").bindparams(
             bindparam("parents", value=parents, expanding=True)
         )
         children = pd.read_sql_query(child_sql, engine, parse_dates=["date"], dtype=dtype)
         if not children.empty:
             data = pd.concat([data, children])
+    # NOTE: Amounts are stored in paise, and converted to rupees in one step
+    data["amount"] = data["amount_paise"] / 100
     data.fillna({"category_id": NO_CATEGORY}, inplace=True)
     data.fillna({"parent": ""}, inplace=True)
     data.counterparty_name = (
@@ -136,9 +142,12 @@ def get_tags() -> dict[int, Tag]:
 @st.cache_data
 def get_months() -> list[tuple[int, int]]:
     engine = get_db_engine()
-    sql = "SELECT date FROM expense"
-    data = pd.read_sql_query(sql, engine, parse_dates=["date"])
-    months = set(data["date"].apply(lambda x: (x.year, x.month)))
+    # NOTE: Children are summarized under the month of their parent, and
+    # children without a top-level parent aren't summarized. So, months with
+    # only such children aren't listed, like load_data doesn't show them.
+    with engine.connect() as conn:
+        sql = text("SELECT DISTINCT year, month FROM monthly_summary")
+        months = set(map(tuple, conn.execute(sql)))
     # NOTE: We use month 13 to represent the whole year
     years = {(y, 13) for (y, _) in months}
     months_sorted = sorted(months.union(years), reverse=True)
@@ -213,15 +222,50 @@ def write_changes_to_db(df: pd.DataFrame) -> None:
         session.commit()
 
 
+@st.cache_data
+def load_summary(
+    start_date: datetime.date,
+    end_date: datetime.date,
+    category_id: int,
+    db_last_modified: float,
+) -> tuple[float, float]:
+    """Total and maximum spend in the date range, from the monthly summary."""
+    # NOTE: db_last_modified is only used to invalidate the memoized data
+    engine = get_db_engine()
+    category_clause = "AND category_id=:category" if category_id != ALL_CATEGORY else ""
+    sql = f"""
+    SELECT coalesce(sum(amount_paise), 0), coalesce(max(max_amount_paise), 0)
+    FROM monthly_summary
+    WHERE NOT ignore
+    AND (year, month) >= (:start_year, :start_month) AND (year, month) < (:end_year, :end_month)
+    {category_clause}
+    """  # noqa: S608
+    params = {
+        "start_year": start_date.year,
+        "start_month": start_date.month,
+        "end_year": end_date.year,
+        "end_month": end_date.month,
+        # NOTE: Uncategorized expenses are summarized under category 0
+        "category": max(category_id, 0),
+    }
+    with engine.connect() as conn:
+        total, max_ = conn.execute(text(sql), params).one()
+    return total / 100, max_ / 100
+
+
+def get_summary(data: pd.DataFrame) -> tuple[float, float]:
+    """Total and maximum spend of the (filtered) data."""
+    data_clean = remove_ignored_rows(data)
+    # NOTE: Sum the amounts in paise, which is exact, unlike a sum of floats
+    total = data_clean["amount_paise"].sum() / 100
+    max_ = data_clean["amount_paise"].max() / 100 if len(data_clean) > 0 else 0
+    return total, max_
+
+
 @st.fragment
-def display_summary_stats(data: pd.DataFrame, prev_data: pd.DataFrame) -> None:
+def display_summary_stats(total: float, prev_total: float, max_: float) -> None:
     col1, col2 = st.columns(2)
-    data_clean = remove_ignored_rows(data)
-    prev_data_clean = remove_ignored_rows(prev_data)
-    total = data_clean["amount"].sum()
-    prev_total = prev_data_clean["amount"].sum()
     delta = delta_percent(total, prev_total)
-    max_ = data_clean["amount"].max() if len(data_clean) > 0 else 0
     col1.metric(
         "Total Spend",
         f"{CURRENCY_SYMBOL} {total:.2f}",
@@ -601,6 +645,28 @@ def display_barcharts(
     st.altair_chart(cast(alt.Chart, chart), use_container_width=True)
 
 
+def filter_data(
+    data: pd.DataFrame, counterparty: str, selected_tags: list[int], low: float, high: float
+) -> pd.DataFrame:
+    if counterparty != "All":
+        data = data[data["counterparty_name"] == counterparty]
+
+    if selected_tags:
+
+        def tag_filter(x: list[int]) -> bool:
+            return bool(set(x).intersection(selected_tags))
+
+        data = data[data.tags.apply(tag_filter)]
+
+    if not np.isneginf(low):
+        data = data[(data.amount >= low) | (data.parent.str.len() > 0)]
+
+    if not np.isposinf(high):
+        data = data[(data.amount <= high) | (data.parent.str.len() > 0)]
+
+    return data
+
+
 def format_row(row: dict[str, Any]) -> str:
     return f"{row['date']:%Y-%m-%d} — {row['amount']:.2f} — {row['details']}:::{row['id']}"
 
@@ -639,7 +705,7 @@ def dashboard() -> None:
 
     # db_last_modified is used to detect DB changes and invalidate Streamlit
     # memoized data
-    db_last_modified = os.path.getmtime(DB_PATH)
+    db_last_modified = get_db_last_modified()
 
     categories = get_categories()
     tags = get_tags()
@@ -649,36 +715,21 @@ def dashboard() -> None:
     data = load_data(start_date, end_date, category, db_last_modified)
 
     prev_start, prev_end = previous_month(start_date)
-    prev_data = load_data(prev_start, prev_end, category, db_last_modified)
     counterparty, selected_tags, (low, high) = display_extra_filters(data, tags, disabled=False)
 
-    if counterparty != "All":
-        data = data[data["counterparty_name"] == counterparty]
-        prev_data = prev_data[prev_data["counterparty_name"] == counterparty]
-
-    if selected_tags:
-
-        def tag_filter(x: list[str]) -> bool:
-            return bool(set(x).intersection(selected_tags))
-
-        data = data[data.tags.apply(tag_filter)]
-        prev_data = prev_data[prev_data.tags.apply(tag_filter)]
-
-    def amount_filter_low(data: pd.DataFrame, low: float) -> pd.DataFrame:
-        return data[(data.amount >= low) | (data.parent.str.len() > 0)]
-
-    def amount_filter_high(data: pd.DataFrame, high: float) -> pd.DataFrame:
-        return data[(data.amount <= high) | (data.parent.str.len() > 0)]
-
-    if not np.isneginf(low):
-        data = amount_filter_low(data, low)
-        prev_data = amount_filter_low(prev_data, low)
-
-    if not np.isposinf(high):
-        data = amount_filter_high(data, high)
-        prev_data = amount_filter_high(prev_data, high)
+    if counterparty == "All" and not selected_tags and np.isneginf(low) and np.isposinf(high):
+        # NOTE: Without the extra filters, the summary is read from the
+        # monthly summary table, instead of loading the previous month's rows
+        total, max_ = load_summary(start_date, end_date, category, db_last_modified)
+        prev_total, _ = load_summary(prev_start, prev_end, category, db_last_modified)
+    else:
+        prev_data = load_data(prev_start, prev_end, category, db_last_modified)
+        data = filter_data(data, counterparty, selected_tags, low, high)
+        prev_data = filter_data(prev_data, counterparty, selected_tags, low, high)
+        total, max_ = get_summary(data)
+        prev_total, _ = get_summary(prev_data)
 
-    display_summary_stats(data, prev_data)
+    display_summary_stats(total, prev_total, max_)
     display_barcharts(data, categories, tags, num_month_days)
     display_transactions(data, categories, tags)
 
@@ -1,89 +1,370 @@
 # Standard libs
 from __future__ import annotations
 
+import datetime
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
 from hashlib import sha1
 from pathlib import Path
 from typing import Any, cast
 
 # 3rd party libs
+import numpy as np
 import pandas as pd
-from sqlalchemy import exc, text
+from sqlalchemy import ColumnDefault, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm.session import Session
 
 # Local
 from app.db_util import (
-    get_db_engine,
+    get_db_url,
     get_sqlalchemy_session,
     parse_details_for_expenses,
 )
-from app.model import Expense
+from app.lib.timings import TIMINGS, Timings
+from app.model import Expense, IngestedFile
 from app.scrapers.base import Source
+from app.util import DATA_REPO_PATH
 
+# NOTE: Older versions of SQLite limit the number of host parameters in a query to 999
+SQLITE_MAX_VARIABLES = 999
+INSERT_CHUNK_SIZE = 10_000
 
-def get_transformed_row(
-    x: pd.Series[Any], header_columns: dict[str, str], filename: str
-) -> pd.Series[Any]:
-    """Transform a parsed row into a row to be saved in the DB."""
-    columns = ["id", "date", "details", "amount", "source_file", "source_line"]
-    date = x[header_columns["date"]]
-    details = x[header_columns["details"]]
-    if isinstance(details, pd.Series):
-        details = "/".join(details.fillna("").str.strip())
-    details = details.strip()
-    amount_columns = amount_h, credit_h, debit_h = (
+
+def get_transformed_data(
+    data: pd.DataFrame, header_columns: dict[str, Any], filename: str
+) -> pd.DataFrame:
+    """Transform parsed rows into rows to be saved in the DB.
+
+    NOTE: The id of a row is a hash of the file name, the row number, the
+    details, the date and the amount. Changing how any of these is formatted
+    changes the ids of already ingested rows. The amount is hashed in rupees,
+    though it is stored in paise.
+
+    """
+    columns = ["id", "date", "details", "amount_paise", "source_file", "source_line"]
+    date = data[header_columns["date"]]
+    details_h = header_columns["details"]
+    if isinstance(details_h, list):
+        parts = [data[column].fillna("").str.strip() for column in details_h]
+        details = parts[0].str.cat(parts[1:], sep="/")
+    else:
+        details = data[details_h]
+    details = details.str.strip()
+    amount_h, credit_h, debit_h = (
         header_columns["amount"],
         header_columns["credit"],
         header_columns["debit"],
     )
-    v = x[list(filter(None, amount_columns))].infer_objects().fillna(0)
-    amount = v[amount_h] if amount_h else v[debit_h] - v[credit_h]
-    hash_text = f"{filename}-{x.name}-{details}-{date}-{amount}"
-    sha = sha1(hash_text.encode("utf8")).hexdigest()  # noqa: S324
-    return pd.Series([sha, date, details, amount, filename, x.name], index=columns)
+    if amount_h:
+        amount = data[amount_h].fillna(0)
+    else:
+        amount = data[debit_h].fillna(0) - data[credit_h].fillna(0)
+    amount = amount.astype("float64")
+
+    hash_texts = (
+        f"{filename}-{line}-{d}-{dt}-{a}"
+        for line, d, dt, a in zip(data.index, details, date, amount.tolist(), strict=True)
+    )
+    ids = [sha1(hash_text.encode("utf8")).hexdigest() for hash_text in hash_texts]  # noqa: S324
+    transformed = pd.DataFrame(
+        {
+            "id": ids,
+            "date": date,
+            "details": details,
+            "amount_paise": (amount * 100).round().astype("int64"),
+            "source_file": filename,
+            "source_line": data.index,
+        },
+        index=data.index,
+    )
+    return transformed[columns]
+
+
+def get_file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Compute the SHA1 hex digest of a file's contents."""
+    digest = sha1()  # noqa: S324
+    with path.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_manifest_key(path: Path) -> str:
+    """Key of a file in the manifest, relative to the data repo when possible."""
+    path = Path(path).absolute()
+    try:
+        return str(path.relative_to(DATA_REPO_PATH.absolute()))
+    except ValueError:
+        return str(path)
+
+
+def load_ingest_manifest(session: Session) -> dict[str, IngestedFile]:
+    return {str(entry.path): entry for entry in session.query(IngestedFile).all()}
+
+
+def is_file_ingested(path: Path, manifest: dict[str, IngestedFile]) -> bool:
+    """Check if a file was already ingested, without reading it if possible.
+
+    A file with the same size and mtime as its manifest entry is treated as
+    unchanged. If only the mtime changed (a fresh clone, a touch, etc.) the
+    content hash is compared, and the entry's mtime is refreshed on a match.
+
+    """
+    entry = manifest.get(get_manifest_key(path))
+    if entry is None:
+        return False
+    stat = path.stat()
+    if stat.st_size != entry.size:
+        return False
+    if stat.st_mtime_ns == entry.mtime_ns:
+        return True
+    if get_file_digest(path) != entry.sha1:
+        return False
+    entry.mtime_ns = stat.st_mtime_ns
+    return True
 
 
-def parse_data(path: Path, source_cls: type[Source]) -> None:
-    """Parses the data in a given `path` and dumps to `DB_NAME`."""
+def record_ingested_file(path: Path, rows: int) -> None:
+    with TIMINGS.measure("record_manifest"):
+        stat = path.stat()
+        entry = IngestedFile(
+            path=get_manifest_key(path),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            sha1=get_file_digest(path),
+            rows=rows,
+            ingested_at=datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None),
+        )
+        session = get_sqlalchemy_session()
+        session.merge(entry)
+        session.commit()
+
+
+def get_read_csv_options(source_cls: type[Source]) -> dict[str, Any]:
+    date_column = cast(str, source_cls.columns["date"])
+    details = source_cls.columns["details"]
+    details_columns = details if isinstance(details, list) else [details]
+    # NOTE: Read details as strings, even if a file (or a chunk) has only numbers
+    dtype = {column: "str" for column in details_columns if column} | source_cls.dtypes
+    return {
+        "dtype": dtype | {date_column: "str"},
+        "thousands": ",",
+        "na_values": [" "],
+    }
+
+
+def parse_date_column(dates: pd.Series[Any], source_cls: type[Source]) -> pd.Series[Any]:
+    return pd.to_datetime(dates, format=source_cls.date_format, dayfirst=True)
+
+
+def read_statement(path: Path, source_cls: type[Source]) -> pd.DataFrame:
+    """Read a statement file into rows that can be saved in the DB.
+
+    This doesn't touch the DB, and can be run in a worker process.
+
+    """
     print(f"Parsing {path} using '{source_cls.name}' scraper...")
     date_column = cast(str, source_cls.columns["date"])
-    data = pd.read_csv(
-        path,
-        parse_dates=[date_column],
-        dayfirst=True,
-        dtype=source_cls.dtypes,
-        thousands=",",
-        na_values=[" "],
-        date_format={date_column: source_cls.date_format},
-    ).sort_values(by=[date_column], ignore_index=True)
+    with TIMINGS.measure("read_csv") as stage:
+        data = pd.read_csv(path, **get_read_csv_options(source_cls))
+        stage.rows = n = len(data)
+    with TIMINGS.measure("parse_dates", n):
+        data[date_column] = parse_date_column(data[date_column], source_cls)
+    with TIMINGS.measure("sort_by_date", n):
+        data = data.sort_values(by=[date_column], ignore_index=True)
     filename = Path(path).name
     columns = source_cls.columns
-    data = data.apply(get_transformed_row, axis=1, header_columns=columns, filename=filename)
+    with TIMINGS.measure("transform_rows", n):
+        return get_transformed_data(data, columns, filename)
 
-    engine = get_db_engine()
-    data["id"].to_sql("new_id", engine, if_exists="append", index=False)
-    try:
-        with engine.connect() as conn:
-            new_ids = conn.execute(
-                text("SELECT id FROM new_id WHERE id NOT IN (SELECT id FROM expense)")
-            ).fetchall()
-            new_ids = [id_ for (id_,) in new_ids]
-            conn.execute(text("DELETE FROM new_id"))
-            conn.commit()
-    except exc.OperationalError:
-        new_ids = list(data["id"])
-
-    # Select only IDs not already in the DB.
-    data = data[data["id"].isin(new_ids)]
+
+def read_statement_with_timings(
+    path: Path, source_cls: type[Source]
+) -> tuple[pd.DataFrame, Timings]:
+    """Read a statement, also returning the timings recorded while reading it.
+
+    Used by worker processes, to send their timings back to the parent.
+
+    """
+    TIMINGS.reset()
+    data = read_statement(path, source_cls)
+    timings = Timings()
+    timings.merge(TIMINGS)
+    return data, timings
+
+
+def read_statement_chunks(
+    path: Path, source_cls: type[Source], chunk_size: int
+) -> Iterator[pd.DataFrame]:
+    """Read a statement file in chunks of rows that can be saved in the DB.
+
+    The row numbers (and hence the ids) are the same as `read_statement`,
+    i.e., the row numbers after sorting the whole file by date. A first pass
+    reads only the date column to compute the sorted position of each row,
+    and the second pass transforms each chunk of rows, in the order of the
+    file. Only the dates and one chunk of rows are held in memory at a time.
+
+    """
+    print(f"Parsing {path} using '{source_cls.name}' scraper, in chunks of {chunk_size}...")
+    date_column = cast(str, source_cls.columns["date"])
+    options = get_read_csv_options(source_cls)
+    with TIMINGS.measure("read_csv_dates") as stage:
+        dates = pd.read_csv(path, usecols=[date_column], **options)[date_column]
+        stage.rows = len(dates)
+    with TIMINGS.measure("parse_dates", len(dates)):
+        dates = parse_date_column(dates, source_cls)
+    # NOTE: Sorting the date column alone gives the same order as sorting the
+    # whole DataFrame by the date column, including the order of ties.
+    order = dates.sort_values().index.to_numpy()
+    positions = np.empty_like(order)
+    positions[order] = np.arange(len(order))
+    del dates, order
+
+    filename = Path(path).name
+    columns = source_cls.columns
+    with pd.read_csv(path, chunksize=chunk_size, **options) as reader:
+        while True:
+            with TIMINGS.measure("read_csv") as stage:
+                chunk = next(reader, None)
+                stage.rows = n = len(chunk) if chunk is not None else 0
+            if chunk is None:
+                break
+            with TIMINGS.measure("parse_dates", n):
+                chunk[date_column] = parse_date_column(chunk[date_column], source_cls)
+            chunk.index = pd.Index(positions[chunk.index.to_numpy()])
+            with TIMINGS.measure("transform_rows", n):
+                transformed = get_transformed_data(chunk, columns, filename)
+            yield transformed
+
+
+def get_existing_ids(session: Session, ids: list[str]) -> set[str]:
+    """Return the subset of `ids` that are already in the DB."""
+    existing: set[str] = set()
+    for start in range(0, len(ids), SQLITE_MAX_VARIABLES):
+        chunk = ids[start : start + SQLITE_MAX_VARIABLES]
+        existing.update(session.scalars(select(Expense.id).where(Expense.id.in_(chunk))))
+    return existing
+
+
+def insert_new_expenses(session: Session, expenses: list[Expense]) -> int:
+    """Bulk insert expenses, ignoring any whose id is already in the DB.
+
+    The expenses are inserted as plain dicts using executemany, in chunks of
+    `INSERT_CHUNK_SIZE`, without going through the ORM's unit of work. The
+    caller is responsible for committing the transaction.
+
+    Returns the number of rows actually inserted.
+
+    """
+    # Use the column defaults for attributes not set on the (transient) objects
+    defaults = {
+        column.key: column.default.arg if isinstance(column.default, ColumnDefault) else None
+        for column in Expense.__table__.columns
+    }
+    records = [
+        {**defaults, **{key: value for key, value in vars(expense).items() if key in defaults}}
+        for expense in expenses
+    ]
+    insert_stmt = sqlite_insert(Expense.__table__).on_conflict_do_nothing(index_elements=["id"])
+    conn = session.connection()
+    rows = 0
+    for start in range(0, len(records), INSERT_CHUNK_SIZE):
+        result = conn.execute(insert_stmt, records[start : start + INSERT_CHUNK_SIZE])
+        rows += result.rowcount
+    return rows
+
+
+def write_new_rows(source_cls: type[Source], data: pd.DataFrame) -> int:
+    """Write the rows that are not already in the DB, and commit them.
+
+    The lookup of existing ids and the insert happen in a single transaction,
+    and the insert ignores ids that were written by a concurrent ingest in
+    the meanwhile.
+
+    Returns the number of new rows written to the DB.
+
+    """
+    session = get_sqlalchemy_session()
+    with TIMINGS.measure("dedup_ids", len(data)):
+        existing_ids = get_existing_ids(session, list(data["id"]))
+        # Select only IDs not already in the DB.
+        data = data[~data["id"].isin(existing_ids)]
     if not data.empty:
-        data["source"] = source_cls.name
-        expenses = [
-            Expense(**{str(key): value for key, value in d.items()})
-            for d in data.to_dict("records")
-        ]
-        parse_details_for_expenses(expenses)
-        session = get_sqlalchemy_session()
-        session.add_all(expenses)
-        session.commit()
-        rows = len(expenses)
+        with TIMINGS.measure("parse_details", len(data)):
+            data["source"] = source_cls.name
+            expenses = [
+                Expense(**{str(key): value for key, value in d.items()})
+                for d in data.to_dict("records")
+            ]
+            parse_details_for_expenses(expenses)
+        with TIMINGS.measure("insert", len(expenses)):
+            rows = insert_new_expenses(session, expenses)
     else:
-        rows = len(data)
-    print(f"Wrote {rows} rows from {path} to the {engine.url}")
+        rows = 0
+    with TIMINGS.measure("commit", rows):
+        session.commit()
+    return rows
+
+
+def write_data(path: Path, source_cls: type[Source], data: pd.DataFrame) -> int:
+    """Write rows read from `path` that are not already in the DB.
+
+    Returns the number of new rows written to the DB.
+
+    """
+    rows = write_new_rows(source_cls, data)
+    print(f"Wrote {rows} rows from {path} to the {get_db_url()}")
+    record_ingested_file(Path(path), rows)
+    return rows
+
+
+def parse_data(path: Path, source_cls: type[Source], chunk_size: int | None = None) -> int:
+    """Parses the data in a given `path` and dumps to `DB_NAME`.
+
+    When `chunk_size` is given, the file is streamed in chunks of that many
+    rows, and each chunk is written to the DB before the next one is read.
+
+    Returns the number of new rows written to the DB.
+
+    """
+    if not chunk_size:
+        data = read_statement(path, source_cls)
+        return write_data(path, source_cls, data)
+
+    rows = 0
+    for chunk in read_statement_chunks(path, source_cls, chunk_size):
+        rows += write_new_rows(source_cls, chunk)
+    print(f"Wrote {rows} rows from {path} to the {get_db_url()}")
+    record_ingested_file(Path(path), rows)
+    return rows
+
+
+def parse_files(
+    files: list[tuple[Path, type[Source]]], jobs: int = 1, chunk_size: int | None = None
+) -> list[int]:
+    """Parse a list of files and write them to the DB, in the given order.
+
+    With `jobs` > 1, the files are read in a pool of worker processes, while
+    the rows are written to the DB by the calling process in the same order
+    as the serial path. The ids and the order of rows written are unchanged.
+    Streaming files in chunks (`chunk_size`) is only supported serially.
+
+    Returns the number of new rows written for each file.
+
+    """
+    if jobs <= 1 or len(files) <= 1 or chunk_size:
+        return [parse_data(path, source_cls, chunk_size) for path, source_cls in files]
+
+    paths = [path for path, _ in files]
+    scrapers = [source_cls for _, source_cls in files]
+    rows = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # NOTE: Executor.map yields results in the order of the inputs
+        results = executor.map(read_statement_with_timings, paths, scrapers)
+        for path, source_cls, (data, timings) in zip(paths, scrapers, results, strict=True):
+            # NOTE: The read stages are summed across workers, and can add up
+            # to more than the wall time.
+            TIMINGS.merge(timings)
+            rows.append(write_data(path, source_cls, data))
+    return rows
@@ -1,23 +1,52 @@
 from __future__ import annotations
 
+import csv
 import datetime
+import functools
 import os
 import re
+import tempfile
 import time
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
-import pandas as pd
+import openpyxl
 import seleniumbase
+from openpyxl.cell.cell import ERROR_CODES
 from seleniumbase import SB
 
 from app.lib.git_manager import GitManager
 from app.model import Expense
 from app.util import extract_csv, today
 
-from .base import Source, Transaction
+from .base import ParseHandler, PrefixDispatcher, Source, Transaction
 
 TODAY = today()
+# Strings read as NA by `pd.read_excel` (and `pd.read_csv`), by default
+STR_NA_VALUES = frozenset(
+    {
+        "",
+        "#N/A",
+        "#N/A N/A",
+        "#NA",
+        "-1.#IND",
+        "-1.#QNAN",
+        "-NaN",
+        "-nan",
+        "1.#IND",
+        "1.#QNAN",
+        "<NA>",
+        "N/A",
+        "NA",
+        "NULL",
+        "NaN",
+        "None",
+        "n/a",
+        "nan",
+        "null",
+    }
+)
 
 
 def remove_currency_prefix(text: str) -> str:
@@ -25,34 +54,340 @@ def remove_currency_prefix(text: str) -> str:
     return text.replace("₹", "").strip()
 
 
-def extract_csv_from_xls(xls_path: Path) -> Path:
-    """Converts XLS(X) to a CSV."""
-    data = pd.read_excel(xls_path)
-    # Find the header row where first column says "Date"
-    header_row_index = int(data[data.iloc[:, 0] == "Date"].index[0])
-    headers = data.iloc[header_row_index]
-    data = data[int(header_row_index) + 1 : -1]
-    data.columns = pd.Index(headers)
-    data = data.dropna(axis=1, how="all")
-
-    # Add "Debit" and "Credit" columns based on the "Debit/Credit" column
-    def clean_column(row: pd.Series[Any], column_name: str) -> str | None:
-        return (
-            remove_currency_prefix(str(row["Amount (INR)"]))
-            if column_name == str(row["Debit/Credit"]).strip()
-            else None
-        )
+def _read_xls_cell(value: Any) -> Any:
+    """Converts a cell value the way `pd.read_excel` does, with None for NA."""
+    if isinstance(value, str):
+        return None if value in STR_NA_VALUES or value in ERROR_CODES else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
 
-    for key in ("Debit", "Credit"):
-        data[key] = data.apply(clean_column, column_name=key, axis=1)
+def _is_empty_xls_cell(value: Any) -> bool:
+    return value is None or value == ""
 
-    # Drop the original "Debit/Credit" column and the "Amount (INR)" column
-    data = data.drop(columns=["Debit/Credit", "Amount (INR)"])
-    csv_path = xls_path.with_suffix(".csv")
-    data.to_csv(csv_path, index=False)
+
+def extract_csv_from_xls(xls_path: Path) -> Path:
+    """Converts XLS(X) to a CSV.
+
+    The rows are streamed from a read-only workbook to a temporary CSV, and
+    the columns without any data are dropped while copying it to the output.
+
+    """
+    workbook = openpyxl.load_workbook(xls_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.active
+        sheet.reset_dimensions()
+        with tempfile.TemporaryFile("w+", newline="") as tmp:
+            writer = csv.writer(tmp)
+            headers: list[Any] = []
+            columns: set[int] = set()
+            # NOTE: The last row with data is the footer, so each row is held
+            # back (with the empty rows after it) until the next row with data.
+            last_row: list[Any] | None = None
+            empty_rows = 0
+            for index, row in enumerate(sheet.iter_rows(values_only=True)):
+                if all(_is_empty_xls_cell(value) for value in row):
+                    empty_rows += 1
+                    continue
+                values = [_read_xls_cell(value) for value in row]
+                # Find the header row where first column says "Date"
+                if not headers:
+                    if index > 0 and values[0] == "Date":
+                        headers = values
+                        kind_index = headers.index("Debit/Credit")
+                        amount_index = headers.index("Amount (INR)")
+                    empty_rows = 0
+                    continue
+                if last_row is not None:
+                    # Add "Debit" and "Credit" columns based on the "Debit/Credit" column
+                    last_row += [None] * (len(headers) - len(last_row))
+                    kind = str(last_row[kind_index]).strip()
+                    amount = last_row[amount_index]
+                    text = remove_currency_prefix("nan" if amount is None else str(amount))
+                    writer.writerow(
+                        [text if kind == key else None for key in ("Debit", "Credit")] + last_row
+                    )
+                    columns.update(i for i, value in enumerate(last_row) if value is not None)
+                writer.writerows([[]] * empty_rows)
+                last_row, empty_rows = values, 0
+
+            if not headers:
+                raise ValueError(f"Could not find the header row in {xls_path}")
+
+            # Drop the empty columns, the original "Debit/Credit" column and
+            # the "Amount (INR)" column
+            headers += [None] * (max(columns, default=0) + 1 - len(headers))
+            columns -= {kind_index, amount_index}
+            kept = sorted(columns)
+
+            tmp.seek(0)
+            csv_path = xls_path.with_suffix(".csv")
+            with csv_path.open("w", newline="") as f:
+                output = csv.writer(f, lineterminator=os.linesep)
+                output.writerow([headers[i] for i in kept] + ["Debit", "Credit"])
+                for row in csv.reader(tmp):
+                    values = row + [""] * (len(headers) + 2 - len(row))
+                    output.writerow([values[i + 2] for i in kept] + values[:2])
+    finally:
+        workbook.close()
     return csv_path
 
 
+@functools.cache
+def get_axis_customid() -> str:
+    return os.getenv("AXIS_CUSTOMID", "")
+
+
+# Handlers for the details of Axis account statements, keyed by their prefix
+AXIS_HANDLERS = PrefixDispatcher()
+
+CTF_NAME_RE = re.compile("[A-Z]+")
+CTF_ID_RE = re.compile("[0-9]+")
+CHARGES_RE = re.compile(
+    "(SMS Alerts|Monthly|Consolidated|GST|Dr Card|Excess).*(Chrg|Charge|Service Fee)",
+    flags=re.IGNORECASE,
+)
+
+
+@AXIS_HANDLERS.register("UPIRECONP2PM/")
+def parse_upi_recon(details: str) -> Transaction:
+    _, transaction_id, _ = (each.strip() for each in details.split("/", 2))
+    return Transaction(
+        transaction_type="UPI",
+        counterparty_type="Merchant",
+        remarks=details,
+    )
+
+
+@AXIS_HANDLERS.register("TIPS/")
+def parse_tips(details: str) -> Transaction:
+    transaction_id = details.split("/")[3] if details.count("/") == 5 else ""  # noqa: PLR2004
+    return Transaction(
+        transaction_id=transaction_id,
+        transaction_type="SCG",
+        counterparty_type="Merchant",
+        remarks=details.rsplit("/", 1)[0],
+    )
+
+
+@AXIS_HANDLERS.register("CTF ")
+def parse_ctf(details: str) -> Transaction:
+    extra = details.split()[-1]
+    to_name_ctf = CTF_NAME_RE.search(extra)
+    to_name_str = to_name_ctf.group() if to_name_ctf else ""
+    transaction_id_ = CTF_ID_RE.search(extra)
+    transaction_id = transaction_id_.group() if transaction_id_ else ""
+    return Transaction(
+        transaction_type="UPI",
+        transaction_id=transaction_id,
+        counterparty_name=to_name_str.title(),
+        counterparty_type="Merchant",
+        remarks=details,
+    )
+
+
+@AXIS_HANDLERS.register("UPI/CRADJ/")
+def parse_upi_credit_adjustment(details: str) -> Transaction:
+    _, _, transaction_id, _ = (each.strip() for each in details.split("/", 3))
+    return Transaction(
+        transaction_type="UPI",
+        transaction_id=transaction_id,
+        counterparty_type="Merchant",
+        remarks=details,
+    )
+
+
+@AXIS_HANDLERS.register("UPI/")
+def parse_upi(details: str) -> Transaction:
+    transaction_type, to_type, transaction_id, to_name, extra = (
+        each.strip() for each in details.split("/", 4)
+    )
+    if "/" in extra:
+        to_bank, remarks = extra.split("/", 1)
+    else:
+        to_bank = ""
+        remarks = extra
+
+    # The transaction format was changed later to interchange bank name
+    # and remarks. Remarks are truncated to 6 characters, in the new
+    # format.
+    if len(to_bank) <= 6:  # noqa: PLR2004
+        to_bank, remarks = remarks, to_bank
+    return Transaction(
+        transaction_id=transaction_id,
+        transaction_type=transaction_type,
+        counterparty_name=to_name.title().strip(),
+        counterparty_type=to_type.strip(),
+        counterparty_bank=to_bank.strip(),
+        remarks=remarks.strip("/").strip(),
+    )
+
+
+@AXIS_HANDLERS.register("IMPS/")
+def parse_imps(details: str) -> Transaction:
+    transaction_type, to_type, transaction_id, to_name, extra = (
+        each.strip() for each in details.split("/", 4)
+    )
+    # FIXME: if to_name is same as axis_id, then it is a credit
+    if extra.count("/") == 0:
+        to_bank = ""
+        remarks = extra
+    elif extra.count("/") == 1:
+        to_bank, remarks = (each.strip() for each in extra.split("/", 1))
+        if to_bank.startswith(("X", "0")):
+            to_bank, remarks = remarks, to_bank
+    else:
+        extra_remarks = extra.split("/", 2)
+        to_bank = extra_remarks[1] if extra_remarks[0].startswith(("X", "0")) else extra_remarks[0]
+        remarks = "/".join(
+            [extra_remarks[0], extra_remarks[2]]
+            if extra_remarks[0].startswith(("X", "0"))
+            else extra_remarks[1:]
+        )
+    return Transaction(
+        transaction_id=transaction_id,
+        transaction_type=transaction_type,
+        counterparty_name=to_name.title().strip(),
+        counterparty_type=to_type.strip(),
+        counterparty_bank=to_bank.strip(),
+        remarks=remarks.strip("/").strip(),
+    )
+
+
+@AXIS_HANDLERS.register("NEFT/")
+def parse_neft(details: str) -> Transaction:
+    transaction_type, to_type, transaction_id, to_name, extra = (
+        each.strip() for each in details.split("/", 4)
+    )
+    if to_type not in {"P2M", "P2A", "MB"}:
+        transaction_id, to_name, to_type, to_bank = to_type, transaction_id, "MB", to_name
+        remarks = extra.rsplit("/", 1)[-1]
+    else:
+        extra = extra.replace("/ATTN/", "ATTN")
+        to_bank, remarks = extra.split("/", 1)
+    return Transaction(
+        transaction_id=transaction_id,
+        transaction_type=transaction_type,
+        counterparty_name=to_name.title().strip(),
+        counterparty_type=to_type.strip(),
+        counterparty_bank=to_bank.strip(),
+        remarks=remarks.strip("/").strip(),
+    )
+
+
+@AXIS_HANDLERS.register("NBSM/")
+def parse_nbsm(details: str) -> Transaction:
+    transaction_type, transaction_id, to_name, remarks = (
+        each.strip() for each in details.split("/", 3)
+    )
+    return Transaction(
+        transaction_id=transaction_id,
+        transaction_type=transaction_type,
+        counterparty_name=to_name.title().strip(),
+        remarks=remarks.strip("/").strip(),
+    )
+
+
+@AXIS_HANDLERS.register("ECOM PUR/")
+def parse_ecom(details: str) -> Transaction:
+    transaction_type, to_name, _ = (each.strip() for each in details.split("/", 2))
+    return Transaction(
+        transaction_type="ECOM",
+        counterparty_name=to_name.title(),
+        counterparty_type="Merchant",
+    )
+
+
+@AXIS_HANDLERS.register("POS/")
+def parse_pos(details: str) -> Transaction:
+    transaction_type, to_name, transaction_id, _ = (each.strip() for each in details.split("/", 3))
+    return Transaction(
+        transaction_type="POS",
+        counterparty_name=to_name.title(),
+        counterparty_type="Merchant",
+    )
+
+
+@AXIS_HANDLERS.register("ATM-CASH")
+def parse_atm(details: str) -> Transaction:
+    _, remarks = (each.strip() for each in details.split("/", 1))
+    return Transaction(
+        transaction_type="ATM",
+        counterparty_name="ATM",
+        remarks=remarks,
+    )
+
+
+@AXIS_HANDLERS.register("BRN-CLG-CHQ")
+def parse_cheque(details: str) -> Transaction:
+    _, counterparty_name = (each.strip() for each in details.split("PAID TO", 1))
+    return Transaction(transaction_type="CHQ", counterparty_name=counterparty_name)
+
+
+def parse_charges(details: str) -> Transaction:
+    return Transaction(
+        transaction_type="AC",
+        counterparty_name="Axis Bank",
+        counterparty_type="Merchant",
+        remarks=details,
+    )
+
+
+def parse_credit_card_payment(details: str) -> Transaction:
+    return Transaction(
+        transaction_type="AC",
+        transaction_id=details.rsplit("#", 1)[-1],
+        counterparty_name="CreditCard Payment",
+        counterparty_type="Merchant",
+        ignore=True,
+    )
+
+
+def parse_account_entry(details: str) -> Transaction:
+    return Transaction(
+        transaction_type="AC",
+        counterparty_name="Axis Bank",
+        counterparty_type="Merchant",
+        remarks=details[len(get_axis_customid()) + 1 :],
+    )
+
+
+def parse_card_payment(details: str) -> Transaction:
+    return Transaction(
+        transaction_type="AC",
+        counterparty_name="Axis Bank",
+        counterparty_type="Merchant",
+        remarks=details,
+        ignore=True,
+    )
+
+
+def has_account_entry(details: str) -> bool:
+    axis_id = get_axis_customid()
+    return bool(axis_id) and f"{axis_id}:" in details
+
+
+# Handlers for the details without a registered prefix, checked in order
+AXIS_FALLBACK_HANDLERS: list[tuple[Callable[[str], bool], ParseHandler]] = [
+    (lambda details: CHARGES_RE.search(details) is not None, parse_charges),
+    (lambda details: details.startswith("CreditCard Payment"), parse_credit_card_payment),
+    (has_account_entry, parse_account_entry),
+    (lambda details: details.startswith("BRN-PYMT-CARD"), parse_card_payment),
+]
+
+
+def find_axis_handler(details: str) -> ParseHandler | None:
+    """Find the handler for parsing the details of an Axis account statement."""
+    handler = AXIS_HANDLERS.find(details)
+    if handler is not None:
+        return handler
+    for matches, handler in AXIS_FALLBACK_HANDLERS:
+        if matches(details):
+            return handler
+    return None
+
+
 def login(sb: seleniumbase.BaseCase) -> None:
     sb.open("https://omni.axisbank.co.in/axisretailbanking/")
     username = os.environ["AXIS_USERNAME"]
@@ -269,200 +604,13 @@ class AxisStatement(Source):
     @staticmethod
     def parse_details(expense: Expense) -> Transaction:
         details = str(expense.details).replace("M/s", "M.s")
-        axis_id = os.getenv("AXIS_CUSTOMID", "")
-        if details.startswith("UPIRECONP2PM/"):
-            _, transaction_id, _ = (each.strip() for each in details.split("/", 2))
-            transaction = Transaction(
-                transaction_type="UPI",
-                counterparty_type="Merchant",
-                remarks=details,
-            )
-        elif details.startswith("TIPS/"):
-            transaction_id = (
-                details.split("/")[3] if details.count("/") == 5 else ""  # noqa: PLR2004
-            )
-            transaction = Transaction(
-                transaction_id=transaction_id,
-                transaction_type="SCG",
-                counterparty_type="Merchant",
-                remarks=details.rsplit("/", 1)[0],
-            )
-        elif details.startswith("CTF "):
-            extra = details.split()[-1]
-            to_name_ctf = re.search("[A-Z]+", extra)
-            to_name_str = to_name_ctf.group() if to_name_ctf else ""
-            transaction_id_ = re.search("[0-9]+", extra)
-            transaction_id = transaction_id_.group() if transaction_id_ else ""
-            transaction = Transaction(
-                transaction_type="UPI",
-                transaction_id=transaction_id,
-                counterparty_name=to_name_str.title(),
-                counterparty_type="Merchant",
-                remarks=details,
-            )
-        elif details.startswith("UPI/CRADJ/"):
-            _, _, transaction_id, _ = (each.strip() for each in details.split("/", 3))
-            transaction = Transaction(
-                transaction_type="UPI",
-                transaction_id=transaction_id,
-                counterparty_type="Merchant",
-                remarks=details,
-            )
-        elif details.startswith("UPI/"):
-            transaction_type, to_type, transaction_id, to_name, extra = (
-                each.strip() for each in details.split("/", 4)
-            )
-            if "/" in extra:
-                to_bank, remarks = extra.split("/", 1)
-            else:
-                to_bank = ""
-                remarks = extra
-
-            # The transaction format was changed later to interchange bank name
-            # and remarks. Remarks are truncated to 6 characters, in the new
-            # format.
-            if len(to_bank) <= 6:  # noqa: PLR2004
-                to_bank, remarks = remarks, to_bank
-            transaction = Transaction(
-                transaction_id=transaction_id,
-                transaction_type=transaction_type,
-                counterparty_name=to_name.title().strip(),
-                counterparty_type=to_type.strip(),
-                counterparty_bank=to_bank.strip(),
-                remarks=remarks.strip("/").strip(),
-            )
-
-        elif details.startswith("IMPS/"):
-            transaction_type, to_type, transaction_id, to_name, extra = (
-                each.strip() for each in details.split("/", 4)
-            )
-            # FIXME: if to_name is same as axis_id, then it is a credit
-            if extra.count("/") == 0:
-                to_bank = ""
-                remarks = extra
-            elif extra.count("/") == 1:
-                to_bank, remarks = (each.strip() for each in extra.split("/", 1))
-                if to_bank.startswith(("X", "0")):
-                    to_bank, remarks = remarks, to_bank
-            else:
-                extra_remarks = extra.split("/", 2)
-                to_bank = (
-                    extra_remarks[1]
-                    if extra_remarks[0].startswith(("X", "0"))
-                    else extra_remarks[0]
-                )
-                remarks = "/".join(
-                    [extra_remarks[0], extra_remarks[2]]
-                    if extra_remarks[0].startswith(("X", "0"))
-                    else extra_remarks[1:]
-                )
-            transaction = Transaction(
-                transaction_id=transaction_id,
-                transaction_type=transaction_type,
-                counterparty_name=to_name.title().strip(),
-                counterparty_type=to_type.strip(),
-                counterparty_bank=to_bank.strip(),
-                remarks=remarks.strip("/").strip(),
-            )
-
-        elif details.startswith("NEFT/"):
-            transaction_type, to_type, transaction_id, to_name, extra = (
-                each.strip() for each in details.split("/", 4)
-            )
-            if to_type not in {"P2M", "P2A", "MB"}:
-                transaction_id, to_name, to_type, to_bank = to_type, transaction_id, "MB", to_name
-                remarks = extra.rsplit("/", 1)[-1]
-            else:
-                extra = extra.replace("/ATTN/", "ATTN")
-                to_bank, remarks = extra.split("/", 1)
-            transaction = Transaction(
-                transaction_id=transaction_id,
-                transaction_type=transaction_type,
-                counterparty_name=to_name.title().strip(),
-                counterparty_type=to_type.strip(),
-                counterparty_bank=to_bank.strip(),
-                remarks=remarks.strip("/").strip(),
-            )
-        elif details.startswith("NBSM/"):
-            transaction_type, transaction_id, to_name, remarks = (
-                each.strip() for each in details.split("/", 3)
-            )
-            transaction = Transaction(
-                transaction_id=transaction_id,
-                transaction_type=transaction_type,
-                counterparty_name=to_name.title().strip(),
-                remarks=remarks.strip("/").strip(),
-            )
-        elif details.startswith("ECOM PUR/"):
-            transaction_type, to_name, _ = (each.strip() for each in details.split("/", 2))
-            transaction = Transaction(
-                transaction_type="ECOM",
-                counterparty_name=to_name.title(),
-                counterparty_type="Merchant",
-            )
-        elif details.startswith("POS/"):
-            transaction_type, to_name, transaction_id, _ = (
-                each.strip() for each in details.split("/", 3)
-            )
-            transaction = Transaction(
-                transaction_type="POS",
-                counterparty_name=to_name.title(),
-                counterparty_type="Merchant",
-            )
-        elif details.startswith("ATM-CASH"):
-            _, remarks = (each.strip() for each in details.split("/", 1))
-            transaction = Transaction(
-                transaction_type="ATM",
-                counterparty_name="ATM",
-                remarks=remarks,
-            )
-        elif details.startswith("BRN-CLG-CHQ"):
-            _, counterparty_name = (each.strip() for each in details.split("PAID TO", 1))
-            transaction = Transaction(transaction_type="CHQ", counterparty_name=counterparty_name)
-        elif (
-            re.search(
-                "(SMS Alerts|Monthly|Consolidated|GST|Dr Card|Excess).*(Chrg|Charge|Service Fee)",
-                details,
-                flags=re.IGNORECASE,
-            )
-            is not None
-        ):
-            transaction = Transaction(
-                transaction_type="AC",
-                counterparty_name="Axis Bank",
-                counterparty_type="Merchant",
-                remarks=details,
-            )
-        elif details.startswith("CreditCard Payment"):
-            transaction = Transaction(
-                transaction_type="AC",
-                transaction_id=details.rsplit("#", 1)[-1],
-                counterparty_name="CreditCard Payment",
-                counterparty_type="Merchant",
-                ignore=True,
-            )
-        elif axis_id and f"{axis_id}:" in details:
-            transaction = Transaction(
-                transaction_type="AC",
-                counterparty_name="Axis Bank",
-                counterparty_type="Merchant",
-                remarks=details[len(axis_id) + 1 :],
-            )
-        elif details.startswith("BRN-PYMT-CARD"):
-            transaction = Transaction(
-                transaction_type="AC",
-                counterparty_name="Axis Bank",
-                counterparty_type="Merchant",
-                remarks=details,
-                ignore=True,
-            )
-        else:
+        handler = find_axis_handler(details)
+        if handler is None:
             # FIXME: Leave this in for debugging, with a commandline arg
             # import pdb
             # pdb.set_trace()
             raise RuntimeError(f"Unknown Transaction Type: {details}")
-
-        return transaction
+        return handler(details)
 
 
 class AxisCCStatement(Source):
@@ -1,4 +1,5 @@
 import datetime
+from collections.abc import Callable
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -20,6 +21,38 @@ class Transaction:
     ignore: bool = False
 
 
+ParseHandler = Callable[[str], Transaction]
+
+
+class PrefixDispatcher:
+    """Registry of the handlers for parsing details, keyed by their prefix.
+
+    A lookup finds the handler of the longest registered prefix of the details,
+    using one dict lookup for each distinct prefix length.
+
+    """
+
+    def __init__(self) -> None:
+        self.handlers: dict[str, ParseHandler] = {}
+        self.lengths: list[int] = []
+
+    def register(self, *prefixes: str) -> Callable[[ParseHandler], ParseHandler]:
+        def decorator(handler: ParseHandler) -> ParseHandler:
+            for prefix in prefixes:
+                self.handlers[prefix] = handler
+            self.lengths = sorted({len(prefix) for prefix in self.handlers}, reverse=True)
+            return handler
+
+        return decorator
+
+    def find(self, details: str) -> ParseHandler | None:
+        for length in self.lengths:
+            handler = self.handlers.get(details[:length])
+            if handler is not None:
+                return handler
+        return None
+
+
 class Source:
     name = "base"
     columns: dict[str, None | str | list[str]] = {}
@@ -2,6 +2,7 @@ import calendar
 import datetime
 import io
 import os
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
 import pytz
@@ -89,6 +90,63 @@ def extract_csv(path: str | io.StringIO, catch_phrase: str = "Transaction Date")
     return io.StringIO("\n".join(lines))
 
 
+def extract_csv_lines(
+    stream: Iterable[str], catch_phrase: str = "Transaction Date"
+) -> Iterator[str]:
+    """Lazily yield the CSV lines of a text stream, like `extract_csv`.
+
+    The lines are read one at a time, and the CSV part starts at the first line
+    with the catch phrase. Nothing is yielded if the catch phrase isn't found.
+
+    """
+    lines = iter(stream)
+    for line in lines:
+        if catch_phrase in line:
+            yield line.strip().strip(",") + "\n"
+            break
+
+    # The CSV ends at the first empty line after the header
+    for line in lines:
+        if not line.strip():
+            break
+        # Strip leading and trailing commas
+        yield line.strip().strip(",") + "\n"
+
+
+class LineStream(io.TextIOBase):
+    """A read-only text stream over an iterable of lines, e.g., for pd.read_csv."""
+
+    mode = "r"
+
+    def __init__(self, lines: Iterable[str]) -> None:
+        self._lines = iter(lines)
+        self._buffer = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int | None = -1, /) -> str:
+        if size is None or size < 0:
+            text, self._buffer = self._buffer + "".join(self._lines), ""
+            return text
+        parts, length = [self._buffer], len(self._buffer)
+        while length < size and (line := next(self._lines, None)) is not None:
+            parts.append(line)
+            length += len(line)
+        text = "".join(parts)
+        text, self._buffer = text[:size], text[size:]
+        return text
+
+    def readline(self, size: int | None = -1, /) -> str:  # type: ignore[override]
+        if not self._buffer:
+            self._buffer = next(self._lines, "")
+        end = self._buffer.find("\n") + 1 or len(self._buffer)
+        if size is not None and 0 <= size < end:
+            end = size
+        text, self._buffer = self._buffer[:end], self._buffer[end:]
+        return text
+
+
 def format_month(year_month: tuple[int, int]) -> str:
     year, month = year_month
     if year > 0 and month <= NUM_MONTHS:
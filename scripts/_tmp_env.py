@@ -0,0 +1,27 @@
+"""Point the app to a DB and a data repository in a temporary directory.
+
+Used by the benchmarks and the checks, so that they don't touch the real DB.
+
+"""
+
+# Standard libs
+import os
+import tempfile
+from pathlib import Path
+
+# Removed when the interpreter exits
+_TMP_DIRS: list[tempfile.TemporaryDirectory[str]] = []
+
+
+def use_temp_data_repo(db_name: str) -> Path:
+    """Use a new temporary directory as the data repository, with the DB `db_name` in it.
+
+    NOTE: The DB path is read from the environment when app.db_util is
+    imported, so this has to be called before importing it.
+
+    """
+    tmp_dir = tempfile.TemporaryDirectory()
+    _TMP_DIRS.append(tmp_dir)
+    os.environ["EXPENSES_DB"] = str(Path(tmp_dir.name, db_name))
+    os.environ["DATA_REPO_PATH"] = tmp_dir.name
+    return Path(tmp_dir.name)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+"""Usage: python benchmark-db-session.py [-n CALLS]
+
+Benchmark getting a session from db_util and running a query with it.
+
+Compares the shared engine and session factory with the old behaviour of
+creating a new engine and sessionmaker for every session, for each kind of
+connection pool. The first call (which creates the engine) and the average
+of the following `-n` calls are timed separately.
+
+"""
+
+# Standard libs
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+# Local
+from _tmp_env import use_temp_data_repo
+
+TMP_DIR = use_temp_data_repo("benchmark.db")
+
+# HACK: include app module in sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 3rd party libs
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.session import Session
+
+# Local
+from app.db_util import (
+    POOL_CLASSES,
+    ensure_categories_created,
+    get_db_engine,
+    get_db_url,
+    get_pool_options,
+    get_sqlalchemy_session,
+    reset_db_engines,
+)
+from app.model import Base, Category
+
+
+def new_session() -> Session:
+    """A session on a new engine, as get_sqlalchemy_session used to make."""
+    return sessionmaker(bind=create_engine(get_db_url()))()
+
+
+def query_categories(get_session: Callable[[], Session]) -> None:
+    with get_session() as session:
+        session.query(Category).all()
+
+
+def query_max_date(get_session: Callable[[], Session]) -> None:
+    with get_session() as session:
+        session.execute(text("SELECT MAX(date) FROM expense")).scalar()
+
+
+def benchmark(get_session: Callable[[], Session], n: int) -> tuple[float, float]:
+    """Time the first call, and the average of the next `n` calls, in ms."""
+    start = time.perf_counter()
+    query_categories(get_session)
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        query = query_categories if i % 2 else query_max_date
+        query(get_session)
+    return first * 1e3, (time.perf_counter() - start) * 1e3 / n
+
+
+def main(n: int) -> None:
+    Base.metadata.create_all(get_db_engine())
+    ensure_categories_created()
+
+    results = {"new engine per session": benchmark(new_session, n)}
+    for pool in POOL_CLASSES:
+        reset_db_engines()
+        factory = sessionmaker(bind=create_engine(get_db_url(), **get_pool_options(pool)))
+        results[f"shared engine, {pool} pool"] = benchmark(factory, n)
+    reset_db_engines()
+    results["get_sqlalchemy_session"] = benchmark(get_sqlalchemy_session, n)
+
+    print(f"{'session':<32} {'first (ms)':>12} {'per call (ms)':>14}")
+    for name, (first, per_call) in results.items():
+        print(f"{name:<32} {first:>12.3f} {per_call:>14.3f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-n", "--calls", default=1000, type=int, help="Number of sessions to time after the first"
+    )
+    args = parser.parse_args()
+    main(args.calls)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""Usage: python benchmark-db-sync.py [-n ROWS] [-r REPEAT] [-e EDITS]
+
+Benchmark the check done by sync_db_with_data_repo on every dashboard rerun.
+
+A DB with `-n` rows (about 50 MB when dumped, by default) is created and
+dumped into a temporary data repo. The check is then timed when the DB and
+the dump are in sync, and when the dump has been touched without changing.
+These are compared with the old check, which dumped the DB into a temporary
+file and compared it with the dump.
+
+The sync after editing `-e` expenses, which appends the edits to the journal
+of the dump, is also compared with rewriting the whole dump.
+
+"""
+
+# Standard libs
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+# Local
+from _tmp_env import use_temp_data_repo
+
+TMP_DIR = use_temp_data_repo("sync.db")
+
+# HACK: include app module in sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 3rd party libs
+from sqlalchemy import bindparam, text
+
+# Local
+from app.db_util import (
+    DB_SYNC_STATE_PATH,
+    compact_db_journal,
+    ensure_categories_created,
+    get_db_dump_path,
+    get_db_engine,
+    is_db_dump_changed,
+    save_db_sync_state,
+    sync_db_with_data_repo,
+)
+from app.lib.synthetic import write_statement
+from app.model import Base
+from app.parse_util import parse_data
+from app.scrapers import AxisStatement
+from app.util import DATA_REPO_PATH
+
+
+def timed(func: Callable[[], object], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def touch_and_sync() -> None:
+    os.utime(get_db_dump_path(DATA_REPO_PATH))
+    sync_db_with_data_repo()
+
+
+def edit_expenses(rows: int, n: int) -> None:
+    sql = text("UPDATE expense SET remarks = :remarks WHERE rowid IN :rowids").bindparams(
+        bindparam("rowids", expanding=True)
+    )
+    rowids = random.sample(range(1, rows + 1), n)
+    with get_db_engine().begin() as conn:
+        conn.execute(sql, {"remarks": f"Edited at {time.time()}", "rowids": rowids})
+
+
+def edit_and_dump(rows: int, n: int) -> None:
+    edit_expenses(rows, n)
+    dump = get_db_dump_path(DATA_REPO_PATH)
+    compact_db_journal(dump)
+    save_db_sync_state(dump)
+
+
+def edit_and_sync(rows: int, n: int) -> None:
+    edit_expenses(rows, n)
+    sync_db_with_data_repo()
+
+
+def main(n: int, repeat: int, edits: int) -> None:
+    Base.metadata.create_all(get_db_engine())
+    ensure_categories_created()
+    path = write_statement(AxisStatement, DATA_REPO_PATH / "axis-statement-0.csv", n)
+    parse_data(path, AxisStatement)
+    sync_db_with_data_repo()
+    dump = get_db_dump_path(DATA_REPO_PATH)
+    print(f"Dumped {n} rows into {dump.stat().st_size / 2**20:.1f} MB")
+
+    results = {
+        "old check (dump and compare)": timed(lambda: is_db_dump_changed(dump), repeat),
+        "in sync": timed(sync_db_with_data_repo, repeat),
+        "dump touched, not changed": timed(touch_and_sync, repeat),
+    }
+    results[f"{edits} edits, rewrite dump"] = timed(lambda: edit_and_dump(n, edits), repeat)
+    results[f"{edits} edits, append journal"] = timed(lambda: edit_and_sync(n, edits), repeat)
+    DB_SYNC_STATE_PATH.unlink()
+    results["no saved state"] = timed(sync_db_with_data_repo, 1)
+
+    print(f"{'check':<30} {'median (ms)':>12} {'max (ms)':>10}")
+    for name, timings in results.items():
+        print(f"{name:<30} {statistics.median(timings) * 1e3:>12.2f} {max(timings) * 1e3:>10.2f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", default=185_000, type=int, help="Number of rows in the DB")
+    parser.add_argument(
+        "-r", "--repeat", default=5, type=int, help="Number of times each check is timed"
+    )
+    parser.add_argument(
+        "-e", "--edits", default=10, type=int, help="Number of expenses edited before a sync"
+    )
+    args = parser.parse_args()
+    main(args.rows, args.repeat, args.edits)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""Usage: python benchmark-ingest.py [--sizes N ...] [--save PATH] [--compare PATH]
+
+Benchmark the ingestion pipeline on synthetic statements of different sizes.
+
+Times parse_data, parse_details_for_expenses (a reparse of all the rows),
+dump_db_to_csv and dump_db_to_shards on a fresh DB for each size. Results can be saved as JSON,
+and compared against a saved baseline to catch regressions.
+
+"""
+
+# Standard libs
+import json
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+HERE = Path(__file__).parent
+ROOT = HERE.parent
+BASELINE = ROOT.joinpath("benchmarks", "ingest-baseline.json")
+
+# Local
+from _tmp_env import use_temp_data_repo
+
+TMP_DIR = use_temp_data_repo("benchmark.db")
+
+# HACK: include app module in sys.path
+sys.path.insert(0, str(ROOT))
+
+# Local
+from app.db_util import (
+    DB_PATH,
+    clear_db_journal,
+    dump_db_to_csv,
+    dump_db_to_shards,
+    ensure_categories_created,
+    get_db_engine,
+    get_sqlalchemy_session,
+    parse_details_for_expenses,
+    reset_db_engines,
+)
+from app.lib.synthetic import write_statement
+from app.model import Base, Expense
+from app.parse_util import parse_data
+from app.scrapers import AxisStatement
+
+SIZES = [1_000, 100_000, 1_000_000]
+
+
+def timed(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def reparse_all() -> None:
+    session = get_sqlalchemy_session()
+    parse_details_for_expenses(session.query(Expense))
+    session.commit()
+
+
+def benchmark(n: int) -> dict[str, dict[str, float]]:
+    reset_db_engines()
+    DB_PATH.unlink(missing_ok=True)
+    Base.metadata.create_all(get_db_engine())
+    ensure_categories_created()
+    tmp = TMP_DIR
+    path = write_statement(AxisStatement, tmp.joinpath(f"{AxisStatement.prefix}-{n}.csv"), n)
+    dump_path = tmp.joinpath("db.csv")
+
+    timings = {
+        "parse_data": timed(lambda: parse_data(path, AxisStatement)),
+        "parse_details_for_expenses": timed(reparse_all),
+    }
+    # NOTE: The edits recorded for the journal are removed before the DB is
+    # dumped by sync_db_with_data_repo, and aren't dumped
+    clear_db_journal()
+    timings["dump_db_to_csv"] = timed(lambda: dump_db_to_csv(dump_path))
+    timings["dump_db_to_shards"] = timed(lambda: dump_db_to_shards(tmp.joinpath("db")))
+    return {
+        stage: {"seconds": round(seconds, 4), "rows_per_second": round(n / seconds, 1)}
+        for stage, seconds in timings.items()
+    }
+
+
+def print_results(
+    results: dict[str, dict[str, dict[str, float]]],
+    baseline: dict[str, dict[str, dict[str, float]]] | None,
+) -> None:
+    header = f"{'rows':>10} {'stage':<28} {'seconds':>10} {'rows/s':>12}"
+    print(header + (f" {'baseline':>10} {'change':>8}" if baseline else ""))
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            line = f"{size:>10} {stage:<28} {result['seconds']:>10.3f} {result['rows_per_second']:>12,.0f}"
+            old = (baseline or {}).get(size, {}).get(stage)
+            if old:
+                change = (result["seconds"] - old["seconds"]) * 100 / old["seconds"]
+                line += f" {old['seconds']:>10.3f} {change:>+7.1f}%"
+            print(line)
+
+
+def main(sizes: list[int], save: Path | None, compare: Path | None, threshold: float) -> int:
+    results = {}
+    for n in sizes:
+        print(f"Benchmarking ingestion of {n} rows...")
+        results[str(n)] = benchmark(n)
+
+    baseline = json.loads(compare.read_text()) if compare else None
+    print_results(results, baseline)
+
+    if save:
+        save.parent.mkdir(parents=True, exist_ok=True)
+        save.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Saved results to {save}")
+
+    if baseline is None:
+        return 0
+
+    regressions = [
+        (size, stage)
+        for size, stages in results.items()
+        for stage, result in stages.items()
+        if (old := baseline.get(size, {}).get(stage))
+        and result["seconds"] > old["seconds"] * (1 + threshold / 100)
+    ]
+    for size, stage in regressions:
+        print(f"Regression: {stage} on {size} rows is more than {threshold}% slower")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", nargs="*", default=SIZES, type=int, help="Number of rows to benchmark"
+    )
+    parser.add_argument("--save", type=Path, help=f"Save results as JSON (e.g., {BASELINE})")
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        nargs="?",
+        const=BASELINE,
+        help="Compare against saved results (default: the stored baseline)",
+    )
+    parser.add_argument(
+        "--threshold",
+        default=20.0,
+        type=float,
+        help="Percentage slowdown compared to the baseline reported as a regression",
+    )
+    args = parser.parse_args()
+    sys.exit(main(args.sizes, args.save, args.compare, args.threshold))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""Usage: python benchmark-insert.py -n <ROWS>
+
+Benchmark writing new expenses to the DB using the ORM (session.add_all)
+and using the bulk insert path used by parse_data. The expenses are read from
+a synthetic Axis statement with `-n` rows.
+
+"""
+
+# Standard libs
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+# HACK: include app module in sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 3rd party libs
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.session import Session
+
+# Local
+from app.lib.synthetic import write_statement
+from app.model import Base, Expense
+from app.parse_util import insert_new_expenses, read_statement
+from app.scrapers import AxisStatement
+
+
+def make_expenses(data: pd.DataFrame) -> list[Expense]:
+    data = data.assign(source=AxisStatement.name)
+    return [
+        Expense(**{str(key): value for key, value in d.items()}) for d in data.to_dict("records")
+    ]
+
+
+def write_orm(session: Session, expenses: list[Expense]) -> None:
+    session.add_all(expenses)
+    session.commit()
+
+
+def write_bulk(session: Session, expenses: list[Expense]) -> None:
+    insert_new_expenses(session, expenses)
+    session.commit()
+
+
+def run(name: str, write: Callable[[Session, list[Expense]], None], data: pd.DataFrame) -> None:
+    expenses = make_expenses(data)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/benchmark.db")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        start = time.perf_counter()
+        write(session, expenses)
+        elapsed = time.perf_counter() - start
+        session.close()
+        engine.dispose()
+    n = len(expenses)
+    print(f"{name:>5}: {n} rows in {elapsed:.2f}s ({n / elapsed:,.0f} rows/s)")
+
+
+def main(n: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_statement(AxisStatement, Path(tmp, "axis-statement-0.csv"), n)
+        data = read_statement(path, AxisStatement)
+    run("orm", write_orm, data)
+    run("bulk", write_bulk, data)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", default=100_000, help="Number of rows", type=int)
+    args = parser.parse_args()
+    main(args.rows)
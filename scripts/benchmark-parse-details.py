@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+"""Usage: python benchmark-parse-details.py [--check] [--update-golden] [-n ROWS] [--repeat N]
+
+Benchmark AxisStatement.parse_details for each kind of details, and check its
+output against a golden file.
+
+The golden file has the transaction (or the error) parsed from each details in
+a corpus of hand-picked edge cases, the sample statement and a synthetic
+statement. `--check` exits with an error when any of them changes. Without
+`--check`, the time taken to parse the corpus is printed for each handler.
+
+"""
+
+# Standard libs
+import dataclasses
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+HERE = Path(__file__).parent
+ROOT = HERE.parent
+GOLDEN = ROOT.joinpath("benchmarks", "axis-parse-details-golden.jsonl")
+
+# NOTE: A fixed customer ID, so that the golden file doesn't depend on the
+# environment of the user running the check.
+AXIS_CUSTOMID = "912345678"
+os.environ["AXIS_CUSTOMID"] = AXIS_CUSTOMID
+
+# HACK: include app module in sys.path
+sys.path.insert(0, str(ROOT))
+
+# 3rd party libs
+import numpy as np
+import pandas as pd
+
+# Local
+from app.lib.synthetic import axis_statement
+from app.model import Expense
+from app.scrapers import AxisStatement
+from app.scrapers.axis import find_axis_handler
+
+# Details for every branch of the parser, including the ones where the order
+# of the checks matters, and a few malformed ones that raise errors.
+CASES = [
+    "UPIRECONP2PM/123456789/REFUND",
+    "TIPS/SCG/1234/567890123/SWIGGY/Eating Out",
+    "TIPS/SCG/1234/abc",
+    "CTF ZOMATO12345",
+    "CTF 9876 SWIGGY123",
+    "CTF nothing",
+    "UPI/CRADJ/123456789/refund",
+    "UPI/P2A/123456789/RAVI KUMAR/Axis Bank/Gift",
+    "UPI/P2M/123456789/Zomato/UPI/HDFC Bank",
+    "UPI/P2M/123456789/Zomato/Eating Out",
+    "UPI/P2M/123456789/M/s ABC TRADERS/Axis Bank/Groceries",
+    "UPI/P2M/123456789/GST Charges/Axis Bank/x",
+    "UPI/P2M/only",
+    "UPI",
+    "IMPS/P2A/123456789/ANIL REDDY/Gift",
+    "IMPS/P2A/123456789/ANIL REDDY/XXXXXXX1234/Gift",
+    "IMPS/P2A/123456789/ANIL REDDY/Kotak Mah/Gift",
+    "IMPS/P2A/123456789/ANIL REDDY/XXXXXXX1234/Kotak Mah/Gift",
+    "IMPS/P2A/123456789/ANIL REDDY/0001234/Kotak Mah/Gift/More",
+    "IMPS/P2A/123456789/ANIL REDDY/Kotak Mah/Gift/More",
+    "NEFT/MB/AXMB123456789/MEENA S/KOTAK MAH/Rent",
+    "NEFT/MB/AXMB123456789/MEENA S/KOTAK MAH/ATTN/Rent",
+    "NEFT/AXNB123456789/MEENA S/HDFC BANK/SALARY/Salary",
+    "NBSM/123456789/RANJAN K/Rent",
+    "ECOM PUR/AMAZON/12-03-2023",
+    "ECOM PUR/x",
+    "POS/APOLLO PHARMACY BANGALORE/123456789/12-03-2023",
+    "ATM-CASH/BANGALORE/1234",
+    "ATM-CASH-AXIS/S1AW1234",
+    "BRN-CLG-CHQ PAID TO RAVI KUMAR",
+    "SMS Alerts Chrg Apr-Jun",
+    "Monthly Service Fee",
+    "GST @18% on Charge",
+    "consolidated charges for a/c",
+    "Dr Card Charges ANNUAL",
+    "Excess Txn Chrg",
+    "CreditCard Payment XXXX 1234 #123456789",
+    "CreditCard Payment GST Charge",
+    f"{AXIS_CUSTOMID}:Int.Pd:01-01-2023 to 31-03-2023",
+    "BRN-PYMT-CARD 1234",
+    "BRN-PYMT-CARD Monthly Chrg",
+    f"BRN-PYMT-CARD {AXIS_CUSTOMID}:x",
+    "SOMETHING ELSE",
+    "",
+]
+
+
+def get_corpus(n: int) -> list[str]:
+    sample = pd.read_csv(ROOT.joinpath("sample", "axis-statement-0.csv"))
+    synthetic = axis_statement(n, np.random.default_rng(0))
+    details = [*CASES, *sample["PARTICULARS"], *synthetic["PARTICULARS"]]
+    return list(dict.fromkeys(str(d) for d in details))
+
+
+def parse(details: str) -> dict[str, Any]:
+    try:
+        transaction = AxisStatement.parse_details(Expense(details=details))
+    except Exception as e:
+        return {"details": details, "error": f"{type(e).__name__}: {e}"}
+    return {"details": details, "transaction": dataclasses.asdict(transaction)}
+
+
+def load_golden() -> list[dict[str, Any]]:
+    with GOLDEN.open() as f:
+        return [json.loads(line) for line in f]
+
+
+def update_golden(n: int) -> None:
+    with GOLDEN.open("w") as f:
+        for details in get_corpus(n):
+            f.write(json.dumps(parse(details), ensure_ascii=False) + "\n")
+    print(f"Wrote golden outputs to {GOLDEN}")
+
+
+def check() -> int:
+    golden = load_golden()
+    mismatches = [entry for entry in golden if parse(entry["details"]) != entry]
+    for entry in mismatches:
+        print(f"Changed: {entry['details']!r}")
+        print(f"  expected: {entry}")
+        print(f"  got:      {parse(entry['details'])}")
+    print(f"Checked {len(golden)} details; {len(mismatches)} changed")
+    return 1 if mismatches else 0
+
+
+def benchmark(n: int, repeat: int) -> None:
+    groups: dict[str, list[Expense]] = defaultdict(list)
+    for details in get_corpus(n):
+        handler = find_axis_handler(details.replace("M/s", "M.s"))
+        groups[handler.__name__ if handler else "unknown"].append(Expense(details=details))
+
+    print(f"{'handler':<28} {'rows':>6} {'us/row':>8}")
+    for name, expenses in sorted(groups.items()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for expense in expenses:
+                try:
+                    AxisStatement.parse_details(expense)
+                except Exception:  # noqa: S112
+                    continue
+        elapsed = time.perf_counter() - start
+        print(f"{name:<28} {len(expenses):>6} {elapsed * 1e6 / (repeat * len(expenses)):>8.2f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true", help="Compare against the golden file")
+    parser.add_argument(
+        "--update-golden", action="store_true", help="Rewrite the golden file from the corpus"
+    )
+    parser.add_argument(
+        "-n", "--rows", default=500, type=int, help="Number of synthetic rows in the corpus"
+    )
+    parser.add_argument(
+        "--repeat", default=100, type=int, help="Number of times the corpus is parsed"
+    )
+    args = parser.parse_args()
+
+    if args.update_golden:
+        update_golden(args.rows)
+    if args.check:
+        sys.exit(check())
+    benchmark(args.rows, args.repeat)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+"""Usage: python benchmark-restore.py [-n ROWS] [--no-old]
+
+Benchmark restoring the DB from its dumps in the data repo.
+
+A DB with `-n` expenses is created in a temporary directory: a statement of
+10,000 rows is parsed, and the rest of the rows are copies of these with new
+ids. The DB is dumped in both formats, and the time taken to restore it
+from each dump is compared with the old restore, which split the dump at
+";\\n" and ran each statement through SQLAlchemy.
+
+"""
+
+# Standard libs
+import sqlite3
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+# Local
+from _tmp_env import use_temp_data_repo
+
+TMP_DIR = use_temp_data_repo("restore.db")
+
+# HACK: include app module in sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 3rd party libs
+from sqlalchemy import create_engine, text
+
+# Local
+from app.db_util import (
+    clear_db_journal,
+    dump_db_to_csv,
+    dump_db_to_shards,
+    ensure_categories_created,
+    get_db_engine,
+    load_db_from_csv,
+    load_db_from_shards,
+)
+from app.lib.synthetic import write_statement
+from app.model import Base, Expense
+from app.parse_util import parse_data
+from app.scrapers import AxisStatement
+from app.util import DATA_REPO_PATH
+
+SEED_ROWS = 10_000
+
+
+def old_load_db_from_csv(db_path: Path, db_dump_path: Path) -> None:
+    """Restore the DB as load_db_from_csv used to."""
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.connect() as conn:
+        sql = db_dump_path.read_text()
+        for statement in sql.split(";\n"):
+            conn.execute(text(statement))
+        conn.commit()
+    engine.dispose()
+
+
+def create_db(n: int) -> None:
+    Base.metadata.create_all(get_db_engine())
+    ensure_categories_created()
+    seed_rows = min(n, SEED_ROWS)
+    path = write_statement(AxisStatement, DATA_REPO_PATH / "axis-statement-0.csv", seed_rows)
+    parse_data(path, AxisStatement)
+    # NOTE: Copying the parsed rows with new ids is much faster than parsing
+    # a statement with all the rows.
+    columns = [column.name for column in Expense.__table__.columns if column.name != "id"]
+    copy_sql = f"""
+    INSERT INTO expense (id, {", ".join(columns)})
+    SELECT lower(hex(randomblob(20))), {", ".join(columns)}
+    FROM expense
+    WHERE source_file = :source_file
+    LIMIT :limit
+    """  # noqa: S608
+    with get_db_engine().begin() as conn:
+        while (rows := conn.execute(text("SELECT count(*) FROM expense")).scalar_one()) < n:
+            params = {"source_file": path.name, "limit": n - rows}
+            conn.execute(text(copy_sql), params)
+    # NOTE: The edits recorded for the journal aren't dumped by the sync
+    clear_db_journal()
+
+
+def count_rows(db_path: Path) -> int:
+    with sqlite3.connect(db_path) as conn:
+        return int(conn.execute("SELECT count(*) FROM expense").fetchone()[0])
+
+
+def main(n: int, old: bool) -> None:
+    print(f"Creating a DB with {n} expenses...")
+    create_db(n)
+    tmp = TMP_DIR
+    csv_path, shards_path = tmp.joinpath("db.csv"), tmp.joinpath("db")
+    dump_db_to_csv(csv_path)
+    dump_db_to_shards(shards_path)
+    print(f"Dumped {n} rows into {csv_path.stat().st_size / 2**20:.1f} MB")
+
+    restores: dict[str, tuple[Callable[[Path, Path], None], Path]] = {
+        "load_db_from_csv": (load_db_from_csv, csv_path),
+        "load_db_from_shards": (load_db_from_shards, shards_path),
+    }
+    if old:
+        restores["old load_db_from_csv"] = (old_load_db_from_csv, csv_path)
+
+    results = {}
+    for name, (load, dump_path) in restores.items():
+        db_path = tmp.joinpath(f"{name.replace(' ', '-')}.db")
+        start = time.perf_counter()
+        load(db_path, dump_path)
+        results[name] = time.perf_counter() - start
+        if (rows := count_rows(db_path)) != n:
+            raise RuntimeError(f"{name} restored {rows} rows instead of {n}")
+        db_path.unlink()
+
+    print(f"{'restore':<24} {'seconds':>10} {'rows/s':>12}")
+    for name, seconds in results.items():
+        print(f"{name:<24} {seconds:>10.2f} {n / seconds:>12,.0f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-n", "--rows", default=1_000_000, type=int, help="Number of expenses in the DB"
+    )
+    parser.add_argument(
+        "--no-old", action="store_true", help="Don't time the old restore, which is slow"
+    )
+    args = parser.parse_args()
+    main(args.rows, not args.no_old)
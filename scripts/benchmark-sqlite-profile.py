@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+"""Usage: python benchmark-sqlite-profile.py [--profiles NAME ...] [-n ROWS] [-m ROWS]
+
+Benchmark the latency of DB reads while a statement is being ingested, for
+each SQLite profile (`sqlite_profile` in conf.toml).
+
+For each profile, a DB with `-n` rows is created in a temporary data repo
+whose conf.toml selects the profile. The dashboard's month-wise query is then
+run repeatedly, first on its own, and then while parse_data writes a new
+statement with `-m` rows in another process.
+
+"""
+
+# Standard libs
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+HERE = Path(__file__).parent
+
+# HACK: include app module in sys.path
+sys.path.insert(0, str(HERE.parent))
+
+# 3rd party libs
+from sqlalchemy import text
+
+# Local
+from app.db_util import (
+    SQLITE_PROFILES,
+    ensure_categories_created,
+    get_db_engine,
+    reset_db_engines,
+)
+from app.lib.synthetic import write_statement
+from app.model import Base
+from app.parse_util import parse_data
+from app.scrapers import AxisStatement
+from app.util import DATA_REPO_PATH
+
+READ_QUERY = text(
+    """
+    SELECT strftime('%Y-%m', date) AS month, count(*), sum(amount_paise)
+    FROM expense
+    GROUP BY month
+    """
+)
+
+
+def read_latencies(seconds: float | None = None, writer: Any = None) -> list[float]:
+    """Time the read query repeatedly, for `seconds` or while `writer` is alive."""
+    engine = get_db_engine()
+    latencies = []
+    end = time.perf_counter() + (seconds or 0)
+    while writer.is_alive() if writer else time.perf_counter() < end:
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            conn.execute(READ_QUERY).fetchall()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(latencies: list[float]) -> dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "reads": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1e3,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1e3,
+        "max_ms": latencies[-1] * 1e3,
+    }
+
+
+def run(n: int, m: int) -> dict[str, Any]:
+    """Run the benchmark for the profile in the conf.toml of the data repo."""
+    Base.metadata.create_all(get_db_engine())
+    ensure_categories_created()
+    path = write_statement(AxisStatement, DATA_REPO_PATH / "axis-statement-0.csv", n)
+    parse_data(path, AxisStatement)
+    path = write_statement(AxisStatement, DATA_REPO_PATH / "axis-statement-1.csv", m, seed=1)
+
+    idle = read_latencies(seconds=2)
+    # NOTE: The writer must not share the pooled connections of this process
+    reset_db_engines()
+    writer = multiprocessing.get_context("fork").Process(
+        target=parse_data, args=(path, AxisStatement)
+    )
+    start = time.perf_counter()
+    writer.start()
+    busy = read_latencies(writer=writer)
+    writer.join()
+    return {
+        "write_seconds": time.perf_counter() - start,
+        "idle": summarize(idle),
+        "writing": summarize(busy),
+    }
+
+
+def main(profiles: list[str], n: int, m: int) -> None:
+    results = {}
+    for profile in profiles:
+        print(f"Benchmarking the {profile!r} profile...")
+        with tempfile.TemporaryDirectory() as tmp:
+            Path(tmp, "conf.toml").write_text(f'[settings]\nsqlite_profile = "{profile}"\n')
+            env = {**os.environ, "DATA_REPO_PATH": tmp, "EXPENSES_DB": str(Path(tmp, "bench.db"))}
+            command = [sys.executable, __file__, "--run", "-n", str(n), "-m", str(m)]
+            output = subprocess.run(  # noqa: S603
+                command, env=env, check=True, capture_output=True, text=True
+            )
+            results[profile] = json.loads(output.stdout.splitlines()[-1])
+
+    print(f"{'profile':<14} {'reads':<8} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for profile, result in results.items():
+        for name in ("idle", "writing"):
+            stats = result[name]
+            print(
+                f"{profile:<14} {name:<8} {stats['reads']:>6} {stats['p50_ms']:>8.2f} "
+                f"{stats['p95_ms']:>8.2f} {stats['max_ms']:>8.2f}"
+            )
+        print(f"{profile:<14} {'write':<8} {m:>6} rows in {result['write_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--profiles",
+        nargs="*",
+        default=list(SQLITE_PROFILES),
+        choices=SQLITE_PROFILES.keys(),
+        help="SQLite profiles to benchmark",
+    )
+    parser.add_argument("-n", "--rows", default=100_000, type=int, help="Number of rows in the DB")
+    parser.add_argument(
+        "-m", "--new-rows", default=50_000, type=int, help="Number of rows written while reading"
+    )
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.rows, args.new_rows)))
+    else:
+        main(args.profiles, args.rows, args.new_rows)
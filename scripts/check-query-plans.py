@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+"""Usage: python check-query-plans.py [-v]
+
+Check that the dashboard and bulk-edit queries on the expense table (and the
+monthly summary) use an index, instead of a full scan of the table.
+
+A DB is created in a temporary directory by running the migrations, and
+`EXPLAIN QUERY PLAN` is run for each query. The SQL of the bulk edits is
+captured by calling the db_util functions (and rolling back their changes),
+while the dashboard queries are copied here, since the dashboard can only be
+imported by streamlit. Exits with an error if any query scans a table.
+
+"""
+
+# Standard libs
+import re
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+# Local
+from _tmp_env import use_temp_data_repo
+
+TMP_DIR = use_temp_data_repo("plans.db")
+
+# HACK: include app module in sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 3rd party libs
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+
+from alembic.config import main as alembic_main
+
+# Local
+from app.db_util import (
+    ensure_categories_created,
+    get_db_engine,
+    get_sqlalchemy_session,
+    update_similar_counterparty_categories,
+    update_similar_counterparty_names,
+)
+from app.lib.synthetic import write_statement
+from app.model import Category, Expense
+from app.parse_util import parse_data
+from app.scrapers import AxisStatement
+
+# A step of a plan that reads every row of a table, e.g., "SCAN expense" or
+# "SCAN e". Scans of an index ("SCAN e USING COVERING INDEX ...") are fine.
+FULL_SCAN_RE = re.compile(r"^SCAN \w+( AS \w+)?$")
+
+# Same as the queries in app/pages/dashboard.py
+LOAD_DATA_SQL = """
+    SELECT e.*, (
+        SELECT JSON_GROUP_ARRAY(et.tag_id) FROM expense_tag et WHERE et.expense_id = e.id
+    ) AS tags
+    FROM expense e
+"""
+DATE_RANGE = {"start_date": "2021-01-01", "end_date": "2021-02-01"}
+DASHBOARD_QUERIES: dict[str, tuple[str, dict[str, Any]]] = {
+    "load_data": (
+        f"""{LOAD_DATA_SQL}
+        WHERE e.date >= :start_date AND e.date < :end_date
+        AND coalesce(e.parent, '') = ''
+        ORDER BY e.id
+        """,
+        DATE_RANGE,
+    ),
+    "load_data (category)": (
+        f"""{LOAD_DATA_SQL}
+        WHERE e.date >= :start_date AND e.date < :end_date
+        AND coalesce(e.parent, '') = ''
+        AND e.category_id=:category
+        ORDER BY e.id
+        """,
+        {**DATE_RANGE, "category": 1},
+    ),
+    "load_data (children)": (
+        f"{LOAD_DATA_SQL} WHERE e.parent IN (:p1, :p2) ORDER BY e.id",
+        {"p1": "a", "p2": "b"},
+    ),
+    "last_updated": ("SELECT MAX(date) FROM expense", {}),
+    "get_months": ("SELECT DISTINCT year, month FROM monthly_summary", {}),
+    "load_summary": (
+        """
+        SELECT coalesce(sum(amount_paise), 0), coalesce(max(max_amount_paise), 0)
+        FROM monthly_summary
+        WHERE NOT ignore
+        AND (year, month) >= (:start_year, :start_month) AND (year, month) < (:end_year, :end_month)
+        AND category_id=:category
+        """,
+        {"start_year": 2021, "start_month": 1, "end_year": 2021, "end_month": 2, "category": 1},
+    ),
+}
+
+
+@contextmanager
+def capture_sql(conn: Connection) -> Iterator[list[tuple[str, Any]]]:
+    """Capture the statements executed on `conn`, with their parameters."""
+    statements: list[tuple[str, Any]] = []
+
+    def before_execute(*args: Any) -> None:
+        _, _, statement, parameters, _, _ = args
+        statements.append((statement, parameters))
+
+    event.listen(conn, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(conn, "before_cursor_execute", before_execute)
+
+
+def get_bulk_edit_queries() -> dict[str, tuple[str, Any]]:
+    session = get_sqlalchemy_session()
+    expense = session.query(Expense).filter(Expense.counterparty_name_p != "").first()
+    if expense is None:
+        raise RuntimeError("No expense with a parsed counterparty name to edit")
+    categories = {int(str(cat.id)): cat for cat in session.query(Category)}
+    category_name = str(next(iter(categories.values())).name)
+
+    queries = {}
+    conn = session.connection()
+    with capture_sql(conn) as statements:
+        update_similar_counterparty_names(session, expense, "New Name")
+    queries["update_similar_counterparty_names"] = statements[-1]
+    with capture_sql(conn) as statements:
+        update_similar_counterparty_categories(session, expense, category_name, categories)
+    queries["update_similar_counterparty_categories"] = statements[-1]
+    session.rollback()
+    return queries
+
+
+def explain(sql: str, parameters: Any) -> list[str]:
+    with get_db_engine().connect() as conn:
+        cursor = conn.connection.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+        return [row[3] for row in cursor.fetchall()]
+
+
+def main(verbose: bool) -> int:
+    alembic_main(["upgrade", "head"])
+    ensure_categories_created()
+    path = write_statement(AxisStatement, TMP_DIR.joinpath("axis-statement-0.csv"), 1000)
+    parse_data(path, AxisStatement)
+
+    queries = {**DASHBOARD_QUERIES, **get_bulk_edit_queries()}
+    failed = set()
+    # NOTE: The plans are checked again with the statistics collected by
+    # ANALYZE, since they can change the plans chosen by SQLite.
+    for stats in ("without statistics", "after ANALYZE"):
+        if stats == "after ANALYZE":
+            with get_db_engine().connect() as conn:
+                conn.exec_driver_sql("ANALYZE")
+        print(f"Query plans {stats}:")
+        for name, (sql, parameters) in queries.items():
+            plan = explain(sql, parameters)
+            scans = [step for step in plan if FULL_SCAN_RE.match(step)]
+            print(f"{'FAIL' if scans else 'ok':<4} {name}")
+            if scans or verbose:
+                for step in plan:
+                    print(f"       {step}")
+            if scans:
+                failed.add(name)
+
+    print(f"Checked {len(queries)} queries; {len(failed)} scan a whole table")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print every query plan")
+    args = parser.parse_args()
+    sys.exit(main(args.verbose))
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+"""Usage: python generate-statements.py -n <ROWS> <OUTPUT-DIR>
+
+Write synthetic statements for each of the scrapers, for benchmarks and
+manual testing.
+
+"""
+
+# Standard libs
+import sys
+from pathlib import Path
+
+# HACK: include app module in sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Local
+from app.lib.synthetic import write_statement
+from app.scrapers import ALL_SCRAPERS
+
+
+def main(output_dir: Path, n: int, scrapers: list[str], seed: int = 0) -> None:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for name in scrapers:
+        source_cls = ALL_SCRAPERS[name]
+        path = output_dir.joinpath(f"{source_cls.prefix}-synthetic-{n}.csv")
+        write_statement(source_cls, path, n, seed=seed)
+        print(f"Wrote {n} rows to {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output_dir", help="Directory to write the statements to", type=Path)
+    parser.add_argument("-n", "--rows", default=1000, help="Number of rows", type=int)
+    parser.add_argument(
+        "--scrapers",
+        nargs="*",
+        choices=ALL_SCRAPERS.keys(),
+        default=sorted(ALL_SCRAPERS.keys()),
+        help="Specify one or more scrapers to generate statements for",
+    )
+    parser.add_argument("--seed", default=0, help="Seed for the random generator", type=int)
+    args = parser.parse_args()
+    main(args.output_dir, args.rows, args.scrapers, args.seed)
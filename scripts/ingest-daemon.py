@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+"""Usage: python ingest-daemon.py [--scrapers NAME ...] [--interval SECONDS]
+                                 [--debounce SECONDS] [--once]
+
+Watch the data repository for new or changed statement files, and ingest them.
+
+The data repository is polled for `*-statement-*.csv` files, and the scraper
+is picked from the prefix of the file name. A file is ingested once it has
+not changed for `--debounce` seconds, so files still being written are not
+read. Files recorded in the ingest manifest with the same contents are never
+parsed again, including files already ingested before the daemon started.
+
+"""
+
+# Standard libs
+import sys
+import time
+import traceback
+from pathlib import Path
+
+# HACK: include app module in sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 3rd-party
+from alembic.config import main as alembic_main
+
+# Local
+from app.db_util import ensure_categories_created, ensure_tags_created, get_sqlalchemy_session
+from app.parse_util import is_file_ingested, load_ingest_manifest, parse_data
+from app.scrapers import ALL_SCRAPERS
+from app.scrapers.base import Source
+from app.util import CONFIG, DATA_REPO_PATH
+
+# A file is identified as unchanged by its size and mtime
+Signature = tuple[int, int]
+
+
+def find_statements(scrapers: dict[str, type[Source]]) -> dict[Path, type[Source]]:
+    """Find the statement files in the data repo, with the scraper for each."""
+    files = {}
+    for path in sorted(DATA_REPO_PATH.glob("**/*-statement-*.csv")):
+        scraper_name = path.stem.split("-statement", 1)[0]
+        if scraper_name in scrapers:
+            files[path] = scrapers[scraper_name]
+    return files
+
+
+def get_signature(path: Path) -> Signature | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class Watcher:
+    """Track changes to the statement files, and ingest the files that settle."""
+
+    def __init__(self, scrapers: dict[str, type[Source]], debounce: float) -> None:
+        self.scrapers = scrapers
+        self.debounce = debounce
+        # Signature of each file when it was last ingested (or found unchanged)
+        self.handled: dict[Path, Signature] = {}
+        # Signature of each changed file, and when it was first seen with it
+        self.pending: dict[Path, tuple[Signature, float]] = {}
+
+    def poll(self) -> list[tuple[Path, type[Source]]]:
+        """Find the changed files that have not changed for `debounce` seconds."""
+        now = time.monotonic()
+        ready = []
+        for path, scraper in find_statements(self.scrapers).items():
+            signature = get_signature(path)
+            if signature is None or self.handled.get(path) == signature:
+                self.pending.pop(path, None)
+                continue
+            seen_signature, seen_at = self.pending.get(path, (None, now))
+            if seen_signature != signature:
+                self.pending[path] = (signature, now)
+                seen_at = now
+            if now - seen_at >= self.debounce:
+                ready.append((path, scraper))
+        return ready
+
+    def ingest(self, files: list[tuple[Path, type[Source]]]) -> int:
+        """Ingest the files not already in the manifest.
+
+        Returns the number of new rows written to the DB.
+
+        """
+        session = get_sqlalchemy_session()
+        manifest = load_ingest_manifest(session)
+        rows = 0
+        for path, scraper in files:
+            signature, _ = self.pending.pop(path)
+            try:
+                if not is_file_ingested(path, manifest):
+                    rows += parse_data(path, scraper)
+            except Exception:
+                # NOTE: The file is retried only when it changes again
+                print(f"Failed to ingest {path}")
+                traceback.print_exc()
+            self.handled[path] = signature
+        # Persist mtimes refreshed while checking for unchanged files
+        session.commit()
+        return rows
+
+
+def main(scrapers: dict[str, type[Source]], interval: float, debounce: float, once: bool) -> None:
+    alembic_main(["upgrade", "head"])
+    ensure_categories_created()
+    ensure_tags_created()
+
+    watcher = Watcher(scrapers, debounce=0 if once else debounce)
+    print(f"Watching {DATA_REPO_PATH} for {', '.join(sorted(scrapers))} statements")
+    while True:
+        files = watcher.poll()
+        if files:
+            rows = watcher.ingest(files)
+            print(f"Checked {len(files)} new or changed files; wrote {rows} new rows")
+        if once:
+            break
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scrapers",
+        nargs="*",
+        choices=ALL_SCRAPERS.keys(),
+        help="Only ingest the statements of these scrapers (default: scrapers in conf.toml)",
+    )
+    parser.add_argument(
+        "--interval", type=float, default=2.0, help="Seconds to wait between scans of the repo"
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=5.0,
+        help="Seconds a file must stay unchanged before it is ingested",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="Ingest the new and changed files once, and exit"
+    )
+    args = parser.parse_args()
+
+    names = sorted(set(args.scrapers)) if args.scrapers else CONFIG.get("scrapers", [])
+
+    if not names:
+        parser.error("Please define scrapers in conf.toml or use --scrapers to specify them.")
+
+    try:
+        main({name: ALL_SCRAPERS[name] for name in names}, args.interval, args.debounce, args.once)
+    except KeyboardInterrupt:
+        print("Stopped watching")
@@ -1,14 +1,23 @@
 #!/usr/bin/env python
 
-"""Usage: python parse-old-data.py --commit -n <N> <FILTERS-JSON>
+"""Usage: python parse-old-data.py [--commit | --dry-run] -n <N> [--jobs N --batch-size M] <FILTERS-JSON>
 
 Script to reparse DB data, when improvements are made to the parser.
 
+Only the fields whose parsed values changed are written back, and the number
+of changed expenses is printed for each field. With `--dry-run`, only this
+summary is printed, without any examples, and nothing is written to the DB.
+
+With `--jobs` or `--batch-size`, the expenses are streamed from the DB in
+batches and parsed in a pool of worker processes. Only the columns that
+changed are written back, in batched UPDATEs.
+
 """
 
 # Standard libs
 import json
 import sys
+from collections import Counter
 from pathlib import Path
 from typing import Any
 
@@ -20,18 +29,28 @@ from sqlalchemy import exc, text
 
 # Local
 from app.db_util import (
+    PARSE_CACHE,
+    ExpenseChange,
     get_db_engine,
     get_sqlalchemy_session,
     parse_details_for_expenses,
+    reparse_expenses,
+    write_expense_changes,
 )
 from app.model import Expense
 
 
+def print_summary(changed: Counter[str]) -> None:
+    for name, count in changed.most_common():
+        print(f"  {name:<24} {count:>8} changed")
+
+
 def parse_old_data(
     filters: dict[str, Any],
     commit: bool = False,
     num_examples: int = 10,
     modify_reviewed: bool = False,
+    dry_run: bool = False,
 ) -> None:
     """Parses "old" data in the DB using the appropriate parser."""
     if not modify_reviewed:
@@ -44,14 +63,72 @@ def parse_old_data(
     session = get_sqlalchemy_session()
     expenses = session.query(Expense).filter_by(**filters)
     count = expenses.count()
-    parse_details_for_expenses(expenses, n_debug=num_examples)
-    n = min(num_examples, count)
+    n_debug = 0 if dry_run else num_examples
+    changed = parse_details_for_expenses(expenses, n_debug=n_debug, dry_run=dry_run)
+    print(f"Parsed details with {PARSE_CACHE.hits} cache hits and {PARSE_CACHE.misses} misses")
     print(f"Filtered {count} transactions to filter... {extra_msg}")
-    print(f"Showing {n} example transactions above")
-    if commit:
+    print("Number of transactions changed, for each field:")
+    print_summary(changed)
+    if dry_run:
+        return
+    n_changed = len(session.dirty)
+    print(f"Parsed details changed for {n_changed} transactions")
+    print(f"Showing {min(num_examples, n_changed)} example changes above")
+    if commit and n_changed:
         yes = input("Do you wish to commit the changes([n]/y)? ")
         if yes[0:1].lower() == "y":
-            print(f"Commiting {count} changes!")
+            print(f"Commiting {n_changed} changes!")
+            session.commit()
+
+
+def print_change(change: ExpenseChange) -> None:
+    print(f"Expense(id={change.id!r}, details={change.details!r})")
+    for name, value in change.new.items():
+        print(f"  {name}: {change.old[name]!r} -> {value!r}")
+    print("#" * 40)
+
+
+def parse_old_data_in_batches(
+    filters: dict[str, Any],
+    commit: bool = False,
+    num_examples: int = 10,
+    modify_reviewed: bool = False,
+    jobs: int = 1,
+    batch_size: int = 1000,
+    dry_run: bool = False,
+) -> None:
+    """Parses "old" data in the DB in batches, using a pool of processes."""
+    if not modify_reviewed:
+        extra_msg = "(unreviewed only)"
+        filters["reviewed"] = False
+    else:
+        filters.pop("reviewed", None)
+        extra_msg = "(including reviewed)"
+
+    session = get_sqlalchemy_session()
+    count = session.query(Expense).filter_by(**filters).count()
+    n_debug = 0 if dry_run else num_examples
+    changes: list[ExpenseChange] = []
+    changed: Counter[str] = Counter()
+    for change in reparse_expenses(session, filters, jobs=jobs, batch_size=batch_size):
+        if len(changes) < n_debug:
+            print_change(change)
+        changes.append(change)
+        changed.update(change.new.keys())
+    print(f"Filtered {count} transactions to filter... {extra_msg}")
+    print("Number of transactions changed, for each field:")
+    print_summary(changed)
+    if dry_run:
+        return
+    print(f"Parsed details changed for {len(changes)} transactions")
+    print(f"Showing {min(num_examples, len(changes))} example changes above")
+    if commit and changes:
+        yes = input("Do you wish to commit the changes([n]/y)? ")
+        if yes[0:1].lower() == "y":
+            rows = write_expense_changes(
+                session, changes, batch_size=batch_size, modify_reviewed=modify_reviewed
+            )
+            print(f"Commiting {rows} changes!")
             session.commit()
 
 
@@ -65,6 +142,11 @@ if __name__ == "__main__":
     parser.add_argument(
         "--commit", action="store_true", help="Commit the changes after confirmation"
     )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the number of changes for each field, without any examples",
+    )
     parser.add_argument(
         "-n", "--num-examples", default=10, help="Number of examples to show", type=int
     )
@@ -73,7 +155,27 @@ if __name__ == "__main__":
         action="store_true",
         help="Modify reviewed expenses as well",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse the details of every expense, even if the same details were already parsed",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes used to parse the details, in batches",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Stream the expenses from the DB and write changes back in batches of these many",
+    )
     args = parser.parse_args()
+    if args.no_cache:
+        PARSE_CACHE.resize(0)
     engine = get_db_engine()
     try:
         filters = json.loads(args.filters)
@@ -86,9 +188,21 @@ if __name__ == "__main__":
             conn.execute(text("SELECT * FROM expense")).fetchone()
     except exc.OperationalError:
         sys.exit("The DB has no old data!")
-    parse_old_data(
-        filters=filters,
-        commit=args.commit,
-        num_examples=args.num_examples,
-        modify_reviewed=args.modify_reviewed,
-    )
+    if args.jobs > 1 or args.batch_size:
+        parse_old_data_in_batches(
+            filters=filters,
+            commit=args.commit,
+            num_examples=args.num_examples,
+            modify_reviewed=args.modify_reviewed,
+            jobs=args.jobs,
+            batch_size=args.batch_size or 1000,
+            dry_run=args.dry_run,
+        )
+    else:
+        parse_old_data(
+            filters=filters,
+            commit=args.commit,
+            num_examples=args.num_examples,
+            modify_reviewed=args.modify_reviewed,
+            dry_run=args.dry_run,
+        )
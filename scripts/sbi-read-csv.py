@@ -6,15 +6,16 @@ import pandas as pd
 # HACK: include app module in sys.path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.util import extract_csv
+from app.util import LineStream, extract_csv_lines
 
 
 def extract_clean_csv(from_filename: str, to_folderpath: str) -> Path:
     """Read a dirty TSV and dump a clean CSV."""
     to_filename = Path(from_filename).with_suffix(".csv").name
     to_path = Path(to_folderpath).absolute().joinpath(to_filename)
-    text = extract_csv(from_filename, catch_phrase="Txn Date")
-    df = pd.read_csv(text, sep="\t")
+    with open(from_filename) as f:
+        lines = extract_csv_lines(f, catch_phrase="Txn Date")
+        df = pd.read_csv(LineStream(lines), sep="\t")
     df.columns = pd.Index([c.strip() for c in df.columns])
     df.to_csv(to_path, index=False)
     return to_path
@@ -11,8 +11,13 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from alembic.config import main as alembic_main
 
 # Local
-from app.db_util import ensure_categories_created, ensure_tags_created
-from app.parse_util import parse_data
+from app.db_util import (
+    ensure_categories_created,
+    ensure_tags_created,
+    get_sqlalchemy_session,
+)
+from app.lib.timings import TIMINGS
+from app.parse_util import is_file_ingested, load_ingest_manifest, parse_files
 from app.scrapers import ALL_SCRAPERS
 from app.util import CONFIG
 
@@ -29,14 +34,40 @@ if __name__ == "__main__":
     )
     parser.add_argument("--no-fetch", action="store_true", help="Skip fetching data")
     parser.add_argument("--no-parse", action="store_true", help="Skip parsing data")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Parse all files, including files already ingested and unchanged",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes used to read statement files in parallel",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Stream statement files in chunks of these many rows, to limit memory usage",
+    )
+    parser.add_argument("--timings", action="store_true", help="Print the time taken by each stage")
+    parser.add_argument(
+        "--timings-json", type=Path, help="Write the time taken by each stage to a JSON file"
+    )
     args = parser.parse_args()
+    if args.jobs > 1 and args.chunk_size:
+        parser.error("--jobs and --chunk-size can't be used together")
 
     # Ensure DB has the latest structure
-    alembic_main(["upgrade", "head"])
+    with TIMINGS.measure("alembic_upgrade"):
+        alembic_main(["upgrade", "head"])
 
     # Ensure tags and categories are created
-    ensure_categories_created()
-    ensure_tags_created()
+    with TIMINGS.measure("ensure_categories_and_tags"):
+        ensure_categories_created()
+        ensure_tags_created()
 
     scrapers_to_use = sorted(set(args.scrapers)) if args.scrapers else CONFIG.get("scrapers", [])
 
@@ -47,14 +78,37 @@ if __name__ == "__main__":
     if not args.no_fetch:
         for scraper_name in scrapers_to_use:
             scraper = ALL_SCRAPERS[scraper_name]
-            scraper.fetch_data()
+            with TIMINGS.measure(f"fetch_data ({scraper_name})"):
+                scraper.fetch_data()
 
     # Parse data if not skipped
     if not args.no_parse:
-        for scraper_name in scrapers_to_use:
-            scraper = ALL_SCRAPERS[scraper_name]
-            for path in scraper.find_files():
-                parse_data(path, scraper)
+        with TIMINGS.measure("check_manifest") as stage:
+            session = get_sqlalchemy_session()
+            manifest = {} if args.force else load_ingest_manifest(session)
+            skipped, to_parse = [], []
+            for scraper_name in scrapers_to_use:
+                scraper = ALL_SCRAPERS[scraper_name]
+                for path in scraper.find_files():
+                    if is_file_ingested(path, manifest):
+                        skipped.append(path)
+                    else:
+                        to_parse.append((path, scraper))
+            # Persist mtimes refreshed while checking for unchanged files
+            session.commit()
+            stage.rows = len(skipped) + len(to_parse)
+
+        rows_written = parse_files(to_parse, jobs=args.jobs, chunk_size=args.chunk_size)
+        ingested = [(path, rows) for (path, _), rows in zip(to_parse, rows_written, strict=True)]
+        print(f"Skipped {len(skipped)} unchanged files; ingested {len(ingested)} files")
+        for path, rows in ingested:
+            print(f"  {path}: {rows} new rows")
+
+    if args.timings:
+        print(TIMINGS.format_table())
+    if args.timings_json:
+        TIMINGS.write_json(args.timings_json)
+        print(f"Wrote timings to {args.timings_json}")
 
     if args.serve:
         from streamlit.web.cli import main_run